@@ -0,0 +1,142 @@
+import io
+import gzip
+import lzma
+import queue
+import threading
+from typing import Optional
+
+from src.codetext.utils.imports import module_available
+
+
+_ZSTANDARD_AVAILABLE = module_available("zstandard")
+
+if _ZSTANDARD_AVAILABLE:
+    import zstandard
+
+COMPRESSION_EXTENSIONS = {
+    '.gz': 'gz',
+    '.zst': 'zst',
+    '.xz': 'xz',
+}
+
+
+def get_compression(filepath: str) -> Optional[str]:
+    """
+    Get compression type from file extension
+
+    .. code-block:: python
+
+        >>> get_compression('batch_0_function_data.jsonl.gz')
+        'gz'
+        >>> get_compression('batch_0_function_data.jsonl')
+        None
+    """
+    for extension, compression in COMPRESSION_EXTENSIONS.items():
+        if str(filepath).endswith(extension):
+            return compression
+    return None
+
+
+def _open_binary(filepath: str, mode: str, compression: Optional[str], level: Optional[int]):
+    if compression is None:
+        return open(filepath, mode)
+
+    if compression == 'gz':
+        if 'r' in mode:
+            return gzip.open(filepath, mode)
+        return gzip.open(filepath, mode, compresslevel=6 if level is None else level)
+
+    if compression == 'xz':
+        if 'r' in mode:
+            return lzma.open(filepath, mode)
+        return lzma.open(filepath, mode, preset=level)
+
+    if compression == 'zst':
+        assert _ZSTANDARD_AVAILABLE == True, "`zstandard` is not installed, try `pip install zstandard`"
+        if 'r' in mode:
+            return io.BufferedReader(zstandard.open(filepath, mode))
+        return zstandard.open(filepath, mode, cctx=zstandard.ZstdCompressor(level=3 if level is None else level))
+
+    raise ValueError(f"Compression {compression} not supported, expect one of {list(COMPRESSION_EXTENSIONS.values())}")
+
+
+def open_file(filepath: str, mode: str='r', compression: Optional[str]='infer', level: Optional[int]=None, threaded: bool=False):
+    """
+    Open plain or compressed (.gz, .zst, .xz) file, compression is picked by
+    file extension unless `compression` is given
+
+    Args:
+        filepath (str): file path
+        mode (str): 'r', 'w', 'a' with 'b' (bytes) or 't' (text, utf8), default to text
+        compression (str): 'infer' (from extension), None, 'gz', 'zst' or 'xz'
+        level (int): compression level (default of each compressor if None)
+        threaded (bool): compress on a background thread (write mode only)
+    """
+    if compression == 'infer':
+        compression = get_compression(filepath)
+
+    binary_mode = mode.replace('t', '')
+    if 'b' not in binary_mode:
+        binary_mode += 'b'
+
+    file = _open_binary(filepath, binary_mode, compression, level)
+    if threaded and 'r' not in mode and compression is not None:
+        file = BackgroundWriter(file)
+        if 'b' not in mode:
+            file = io.BufferedWriter(file)
+
+    if 'b' in mode:
+        return file
+    return io.TextIOWrapper(file, encoding='utf8')
+
+
+class BackgroundWriter(io.RawIOBase):
+    """
+    Forward writes to `file` on a background thread, so that compression
+    overlaps with the caller's work. Errors are re-raised on next `write` or `close`
+
+    Args:
+        file: binary file object
+        max_queue (int): maximum number of pending writes
+    """
+    def __init__(self, file, max_queue: int=16):
+        super().__init__()
+        self._file = file
+        self._queue = queue.Queue(max_queue)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            data = self._queue.get()
+            if data is None:
+                break
+            if self._error is not None:
+                continue
+            try:
+                self._file.write(data)
+            except BaseException as error:
+                self._error = error
+
+    def _check_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._check_error()
+        data = bytes(data)
+        self._queue.put(data)
+        return len(data)
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        super().close()
+        self._check_error()
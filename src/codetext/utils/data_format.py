@@ -0,0 +1,58 @@
+from typing import Any, Dict, Tuple
+
+import yaml
+
+
+class DataFormat:
+    """
+    Compiled raw data format (see `data/format/README.md`). Load the .yaml
+    file once and map every raw sample into source code and metadata
+    
+    Args:
+        key_map (Dict[str, str]): output key -> key in raw sample
+    """
+    MAIN_KEYS = ['code', 'repo', 'path', 'language']
+    
+    def __init__(self, key_map: Dict[str, str]):
+        if not isinstance(key_map, Dict):
+            raise ValueError(f"Expect data format is a mapping, got {type(key_map)}")
+        
+        missing_keys = [key for key in self.MAIN_KEYS if key not in key_map]
+        if missing_keys:
+            raise ValueError(f"Data format missing main keys {missing_keys}")
+        
+        self.key_map = dict(key_map)
+        self.additional_keys = [key for key in self.key_map if key not in self.MAIN_KEYS]
+    
+    @classmethod
+    def from_yaml(cls, filepath: str) -> 'DataFormat':
+        with open(filepath, 'r') as stream:
+            return cls(yaml.safe_load(stream))
+    
+    def validate(self, data: Dict[str, Any]) -> None:
+        """Raise `ValueError` if sample does not contain every declared key"""
+        missing_keys = [key for key in self.key_map.values() if key not in data]
+        if missing_keys:
+            raise ValueError(
+                f"Sample does not match data format, missing {missing_keys} "
+                f"(found keys {list(data.keys())})"
+            )
+    
+    def extract(self, data: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+        """
+        Extract source code and metadata from a raw sample
+        
+        Returns:
+            Tuple[str, Dict]: raw code and metadata (repo, path, language 
+                and additional content)
+        """
+        key_map = self.key_map
+        metadata = {
+            "repo": data[key_map["repo"]], 
+            "path": data[key_map["path"]], 
+            "language": data[key_map["language"]],
+        }
+        for key in self.additional_keys:
+            metadata[key] = data[key_map[key]]
+        
+        return data[key_map["code"]], metadata
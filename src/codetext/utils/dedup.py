@@ -0,0 +1,76 @@
+import os
+import hashlib
+import sqlite3
+
+
+class ContentDedup:
+    """
+    Disk-backed set of content hashes shared by every worker (sqlite, one
+    connection per process). The first task claiming a content keeps it,
+    later copies are reported as duplicates. Owner (task index, position)
+    is recorded so that a retried or resumed task keeps its own samples, an
+    owner which fails to process the content releases it to later copies
+
+    Args:
+        db_path (str): sqlite database path
+
+    .. code-block:: python
+
+        >>> dedup = ContentDedup('save_path/dedup.sqlite')
+        >>> dedup.is_duplicate(code_bytes, batch=0, position=0)
+        False
+        >>> dedup.is_duplicate(code_bytes, batch=1, position=7)
+        True
+    """
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._connection = None
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        # Opened lazily, a connection can not be shared across processes
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.db_path, timeout=600, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('PRAGMA synchronous=OFF')
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS hashes (hash BLOB PRIMARY KEY, batch INTEGER, position INTEGER) WITHOUT ROWID'
+            )
+        return self._connection
+
+    @staticmethod
+    def hash(content: bytes) -> bytes:
+        return hashlib.blake2b(content, digest_size=16).digest()
+
+    def is_duplicate(self, content: bytes, batch: int, position: int) -> bool:
+        """Claim `content` for sample `position` of task `batch`, True if another sample owns it"""
+        digest = self.hash(content)
+        cursor = self.connection.execute(
+            'INSERT OR IGNORE INTO hashes (hash, batch, position) VALUES (?, ?, ?)', (digest, batch, position)
+        )
+        if cursor.rowcount == 1:
+            return False
+        owner = self.connection.execute('SELECT batch, position FROM hashes WHERE hash = ?', (digest,)).fetchone()
+        return owner != (batch, position)
+
+    def release(self, content: bytes, batch: int, position: int) -> bool:
+        """Drop the claim of sample `position` of task `batch` on `content`, True if it owned it"""
+        cursor = self.connection.execute(
+            'DELETE FROM hashes WHERE hash = ? AND batch = ? AND position = ?', (self.hash(content), batch, position)
+        )
+        return cursor.rowcount == 1
+
+    def __len__(self) -> int:
+        return self.connection.execute('SELECT COUNT(*) FROM hashes').fetchone()[0]
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    @staticmethod
+    def remove(db_path: str) -> None:
+        """Delete a database and its WAL files (fresh run)"""
+        for path in [db_path, f'{db_path}-wal', f'{db_path}-shm']:
+            if os.path.exists(path):
+                os.remove(path)
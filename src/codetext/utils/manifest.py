@@ -0,0 +1,78 @@
+import os
+import json
+import logging
+from typing import Any, Dict, List
+
+from src.codetext.utils.writer import file_checksum
+
+
+logger = logging.getLogger('utils')
+
+
+class Manifest:
+    """
+    Append-only record of finished shards (one json line per shard) used
+    to resume an interrupted processing run. Each entry contains the shard
+    descriptor (input range), record counts and output checksums.
+
+    Args:
+        filepath (str): manifest path (e.g: <save_path>/manifest.jsonl)
+        resume (bool): keep entries of the previous run, otherwise start fresh
+    """
+    def __init__(self, filepath: str, resume: bool=False):
+        self.filepath = filepath
+        self.root = os.path.dirname(filepath)
+        self.entries = {}
+
+        if resume and os.path.exists(filepath):
+            complete = 0  # end of the last complete line
+            with open(filepath, 'rb') as file:
+                for line in file:
+                    if not line.endswith(b'\n'):
+                        break
+                    complete += len(line)
+                    try:
+                        entry = json.loads(line)
+                    except Exception:  # torn write from a crash
+                        continue
+                    self.entries[entry['idx']] = entry
+            # Drop a torn last line, the next entry would be appended to it
+            if complete < os.path.getsize(filepath):
+                os.truncate(filepath, complete)
+        elif os.path.exists(filepath):
+            os.remove(filepath)
+
+    def is_done(self, idx: int, shard: Dict[str, Any]) -> bool:
+        """Shard was finished with the same input range and its outputs are intact"""
+        entry = self.entries.get(idx)
+        if entry is None or entry['shard'] != shard:
+            return False
+
+        for output, checksum in entry['outputs'].items():
+            output = os.path.join(self.root, output)
+            if not os.path.exists(output) or file_checksum(output) != checksum:
+                logger.warning(f"Output {output} of shard {idx} is missing or corrupted, redo shard")
+                return False
+        return True
+
+    def add(self, idx: int, shard: Dict[str, Any], counts: List[int], outputs: Dict[str, str]) -> None:
+        """
+        Mark shard as finished
+
+        Args:
+            idx (int): shard (batch) index
+            shard (Dict): shard descriptor
+            counts (List[int]): number of records per output type
+            outputs (Dict[str, str]): output path -> sha256 checksum
+        """
+        entry = {
+            'idx': idx,
+            'shard': shard,
+            'counts': counts,
+            'outputs': {os.path.relpath(path, self.root): checksum for path, checksum in outputs.items()},
+        }
+        self.entries[idx] = entry
+        with open(self.filepath, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
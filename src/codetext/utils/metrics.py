@@ -0,0 +1,177 @@
+import os
+import json
+import time
+import shutil
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Optional
+
+
+class Metrics:
+    """
+    Per-stage timers and counters of the extraction pipeline. Each worker
+    fills its own `Metrics`, the main process merges them with `update`.
+
+    .. code-block:: python
+
+        >>> metrics = Metrics()
+        >>> with metrics.timer('parse'):
+        ...     tree = parser.parse(code)
+        >>> metrics.count('samples')
+    """
+    def __init__(self):
+        self.timings = defaultdict(float)
+        self.counters = defaultdict(int)
+
+    @contextmanager
+    def timer(self, stage: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.timings[stage] += time.perf_counter() - start
+
+    def count(self, key: str, value: int=1) -> None:
+        self.counters[key] += value
+
+    def update(self, other: Dict[str, Any]) -> None:
+        """Merge metrics of another worker (output of `to_dict`)"""
+        for stage, seconds in other['timings'].items():
+            self.timings[stage] += seconds
+        for key, value in other['counters'].items():
+            self.counters[key] += value
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'timings': dict(self.timings), 'counters': dict(self.counters)}
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        """
+        Aggregated report with throughput and share of each stage
+
+        Args:
+            elapsed (float): wall-clock seconds since the run started
+        """
+        total_time = sum(self.timings.values())
+        return {
+            'elapsed': elapsed,
+            'counters': dict(self.counters),
+            'throughput': {
+                'samples/s': self.counters['samples'] / elapsed if elapsed > 0 else 0.,
+                'MB/s': self.counters['bytes'] / 2**20 / elapsed if elapsed > 0 else 0.,
+            },
+            'stages': {
+                stage: {
+                    'seconds': seconds,
+                    'share': seconds / total_time if total_time > 0 else 0.,
+                } for stage, seconds in self.timings.items()
+            },
+        }
+
+    def save(self, filepath: str, elapsed: float) -> None:
+        """Atomically write `summary` as json"""
+        _dump_json(self.summary(elapsed), filepath, indent=2)
+
+    def publish(self, filepath: str) -> None:
+        """Atomically write `to_dict` as json (partial metrics of a running task, see `MetricsSaver`)"""
+        _dump_json(self.to_dict(), filepath)
+
+
+class MetricsSaver:
+    """
+    Saves the metrics of a run every `interval` seconds from a background
+    thread of the main process. Saved metrics are those of finished tasks
+    (`finish`) merged with the latest partial metrics published by running
+    tasks in `partial_dir` (`Metrics.publish`), so a long task shows up
+    before it is done
+
+    Args:
+        filepath (str): output metrics.json
+        partial_dir (str): directory of partial metrics (`task_path`), cleared on start
+        interval (float): seconds between two saves (0 to save on `stop` only)
+        clock (Callable[[], float]): time source, `elapsed` is counted from `start`
+
+    .. code-block:: python
+
+        >>> saver = MetricsSaver('save_path/metrics.json', 'save_path/metrics.partial', interval=60)
+        >>> saver.start()
+        >>> saver.finish(idx, task_metrics)
+        >>> saver.stop()
+    """
+    def __init__(self, filepath: str, partial_dir: str, interval: float=60, clock: Callable[[], float]=time.perf_counter):
+        self.filepath = filepath
+        self.partial_dir = partial_dir
+        self.interval = interval
+        self.clock = clock
+        self.metrics = Metrics()
+
+        self._start = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def task_path(partial_dir: str, task: int) -> str:
+        """Partial metrics of `task`"""
+        return os.path.join(partial_dir, f'task_{task}.json')
+
+    def finish(self, task: int, task_metrics: Dict[str, Any]) -> None:
+        """Merge the final metrics of `task`, its partial metrics are dropped"""
+        with self._lock:
+            self.metrics.update(task_metrics)
+            self.drop([task])
+
+    def drop(self, tasks: Iterable[int]) -> None:
+        """Forget partial metrics of `tasks` (failed or run again from the start)"""
+        for task in tasks:
+            path = self.task_path(self.partial_dir, task)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def snapshot(self) -> Metrics:
+        """Metrics of finished tasks plus partial metrics of running ones"""
+        merged = Metrics()
+        with self._lock:
+            merged.update(self.metrics.to_dict())
+            for name in os.listdir(self.partial_dir):
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    with open(os.path.join(self.partial_dir, name)) as file:
+                        merged.update(json.load(file))
+                except (OSError, ValueError):  # replaced or removed meanwhile
+                    continue
+        return merged
+
+    def save(self) -> None:
+        self.snapshot().save(self.filepath, self.clock() - self._start)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def start(self, start: Optional[float]=None) -> None:
+        """Start saving, `start` is the clock value the run started at (now if None)"""
+        self._start = self.clock() if start is None else start
+        if os.path.exists(self.partial_dir):
+            shutil.rmtree(self.partial_dir)
+        os.makedirs(self.partial_dir)
+        if self.interval > 0:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the saving thread and save metrics of finished tasks"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        shutil.rmtree(self.partial_dir, ignore_errors=True)
+        self.metrics.save(self.filepath, self.clock() - self._start)
+
+
+def _dump_json(data: Any, filepath: str, **kwargs) -> None:
+    tmp_path = f'{filepath}.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file, **kwargs)
+    os.replace(tmp_path, filepath)
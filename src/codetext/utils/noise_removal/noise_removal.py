@@ -50,11 +50,12 @@ def split_identifier_into_parts(identifier: str) -> List[str]:
     return identifier_parts
 
 
-def check_node_error(node: Node) -> bool:
+def check_node_error(node: Node, index=None) -> bool:
     """
     Check if node contains "ERROR" node
     Args:
         node (tree_sitter.Node): node
+        index (NodeIndex): (optional) node index of the tree, avoids a traversal
     
     Return:
         bool
@@ -63,7 +64,7 @@ def check_node_error(node: Node) -> bool:
         raise ValueError("Expect type tree_sitter.Node, get %i", type(node))
 
     error_node = []        
-    traverse_type(node, error_node, ['ERROR'])
+    traverse_type(node, error_node, ['ERROR'], index=index)
     if len(error_node) > 0:
         return True
     else:
@@ -746,7 +747,7 @@ def check_contain_url(docstring: str):
 
 # =================== End checking ======================
 
-def check_function(node, node_metadata: Dict[str, Any], exclude_list: List = None, is_class=False):
+def check_function(node, node_metadata: Dict[str, Any], exclude_list: List = None, is_class=False, index=None):
     """
     Check function if
         - is built-in function (python)
@@ -758,13 +759,14 @@ def check_function(node, node_metadata: Dict[str, Any], exclude_list: List = Non
     Args:
         node (tree_sitter.Node): function node
         exclude_list (List): exclude name of function
+        index (NodeIndex): (optional) node index of the tree
     Return:
         bool: pass the check or not
     """
     node_identifier = node_metadata['identifier']
     
     # Check node/code
-    if check_node_error(node):
+    if check_node_error(node, index):
         return False
     if check_black_node(node_identifier, exclude_list):
         return False
@@ -874,7 +876,7 @@ def clean_docstring(docstring: str, loosen_filter: bool = False):
         for line in docstring_list:
             try:
                 line = remove_special_tag(line)
-            except:
+            except Exception:
                 print('Oops')
                 return None
             
@@ -8,6 +8,8 @@ from docstring_parser.common import *
 
 class CsharpParser(LanguageParser):
     
+    FUNCTION_TYPES = ('local_function_statement', 'method_declaration')
+    CLASS_TYPES = ('class_declaration',)
     BLACKLISTED_FUNCTION_NAMES = []
     
     @staticmethod
@@ -79,7 +81,7 @@ class CsharpParser(LanguageParser):
         return docstring_node
     
     @staticmethod
-    def get_comment_node(node):
+    def get_comment_node(node, index=None):
         """
         Return all comment node inside a parent node
         Args:
@@ -88,20 +90,20 @@ class CsharpParser(LanguageParser):
             List: list of comment nodes
         """
         comment_node = []
-        traverse_type(node, comment_node, kind=['comment'])
+        traverse_type(node, comment_node, CsharpParser.COMMENT_TYPES, index=index)
         return comment_node
     
     @staticmethod
     def get_function_list(node):
         res = []
         # We don't use "constructor_declaration"
-        traverse_type(node, res, ['local_function_statement', 'method_declaration'])
+        traverse_type(node, res, CsharpParser.FUNCTION_TYPES)
         return res
 
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['class_declaration'])
+        traverse_type(node, res, CsharpParser.CLASS_TYPES)
         return res
 
     @staticmethod
@@ -6,6 +6,8 @@ from src.codetext.utils.parser.language_parser import LanguageParser, match_from
 
 class CppParser(LanguageParser):
     
+    FUNCTION_TYPES = ('function_definition',)
+    CLASS_TYPES = ('class_specifier',)
     BLACKLISTED_FUNCTION_NAMES = ['main', 'constructor']
     
     @staticmethod
@@ -74,17 +76,17 @@ class CppParser(LanguageParser):
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['function_definition'])
+        traverse_type(node, res, CppParser.FUNCTION_TYPES)
         return res
 
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['class_specifier'])
+        traverse_type(node, res, CppParser.CLASS_TYPES)
         return res
         
     @staticmethod
-    def get_comment_node(node):
+    def get_comment_node(node, index=None):
         """
         Return all comment node inside a parent node
         Args:
@@ -93,7 +95,7 @@ class CppParser(LanguageParser):
             List: list of comment nodes
         """
         comment_node = []
-        traverse_type(node, comment_node, kind=['comment'])
+        traverse_type(node, comment_node, CppParser.COMMENT_TYPES, index=index)
         return comment_node
     
     @staticmethod
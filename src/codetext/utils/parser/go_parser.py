@@ -6,10 +6,12 @@ from .language_parser import LanguageParser, match_from_span, tokenize_code, tok
 
 class GoParser(LanguageParser):
 
+    FUNCTION_TYPES = ('method_declaration', 'function_declaration')
+
     BLACKLISTED_FUNCTION_NAMES = ['test', 'vendor']
     
     @staticmethod
-    def get_comment_node(function_node):
+    def get_comment_node(function_node, index=None):
         """
         Return all comment node inside a parent node
         Args:
@@ -18,7 +20,7 @@ class GoParser(LanguageParser):
             List: list of comment nodes
         """
         comment_node = []
-        traverse_type(function_node, comment_node, kind='comment')
+        traverse_type(function_node, comment_node, GoParser.COMMENT_TYPES, index=index)
         return comment_node
     
     @staticmethod
@@ -86,7 +88,7 @@ class GoParser(LanguageParser):
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['method_declaration', 'function_declaration'])
+        traverse_type(node, res, GoParser.FUNCTION_TYPES)
         return res
     
     @staticmethod
@@ -6,6 +6,10 @@ from .language_parser import LanguageParser, match_from_span, tokenize_code, tok
 
 class JavaParser(LanguageParser):
 
+    FUNCTION_TYPES = ('method_declaration',)
+    CLASS_TYPES = ('class_declaration',)
+    COMMENT_TYPES = ('line_comment',)
+
     FILTER_PATHS = ('test', 'tests')
 
     BLACKLISTED_FUNCTION_NAMES = ['toString', 'hashCode', 'equals', 'finalize', 'notify', 'notifyAll', 'clone']
@@ -48,7 +52,7 @@ class JavaParser(LanguageParser):
         return docstring
 
     @staticmethod
-    def get_comment_node(function_node):
+    def get_comment_node(function_node, index=None):
         """
         Return all comment node inside a parent node
         Args:
@@ -57,19 +61,19 @@ class JavaParser(LanguageParser):
             List: list of comment nodes
         """
         comment_node = []
-        traverse_type(function_node, comment_node, kind=['line_comment'])
+        traverse_type(function_node, comment_node, JavaParser.COMMENT_TYPES, index=index)
         return comment_node
     
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['class_declaration'])
+        traverse_type(node, res, JavaParser.CLASS_TYPES)
         return res
     
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['method_declaration'])
+        traverse_type(node, res, JavaParser.FUNCTION_TYPES)
         return res
     
     @staticmethod
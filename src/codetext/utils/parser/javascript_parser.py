@@ -5,6 +5,9 @@ from .language_parser import LanguageParser, match_from_span, nodes_are_equal, t
 
 class JavascriptParser(LanguageParser):
 
+    FUNCTION_TYPES = ('function_declaration', 'function', 'method_definition', 'generator_function_declaration')
+    CLASS_TYPES = ('class_declaration', 'class')
+
     FILTER_PATHS = ('test', 'node_modules')
 
     BLACKLISTED_FUNCTION_NAMES = ['toString', 'toLocaleString', 'valueOf', 'constructor']
@@ -36,15 +39,15 @@ class JavascriptParser(LanguageParser):
         return docstring
     
     @staticmethod
-    def get_comment_node(function_node):
+    def get_comment_node(function_node, index=None):
         comment_node = []
-        traverse_type(function_node, comment_node, kind=['comment'])
+        traverse_type(function_node, comment_node, JavascriptParser.COMMENT_TYPES, index=index)
         return comment_node
     
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['function_declaration', 'function', 'method_definition', 'generator_function_declaration'])
+        traverse_type(node, res, JavascriptParser.FUNCTION_TYPES)
         for node in res[:]:
             if not node.children:
                 res.remove(node)
@@ -54,7 +57,7 @@ class JavascriptParser(LanguageParser):
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['class_declaration', 'class'])
+        traverse_type(node, res, JavascriptParser.CLASS_TYPES)
         for node in res[:]:
             if not node.children:
                 res.remove(node)
@@ -1,9 +1,12 @@
 import re
+from bisect import bisect_left
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any, Set, Optional
+from typing import List, Dict, Any, Set, Optional, Tuple, Iterable
 
 import tree_sitter
 
+from .query import QueryIndex
+
 DOCSTRING_REGEX = re.compile(r"(['\"])\1\1(.*?)\1{3}", flags=re.DOTALL)
 DOCSTRING_REGEX_TOKENIZER = re.compile(r"[^\s,'\"`.():\[\]=*;>{\}+-/\\]+|\\+|\.+|\(\)|{\}|\[\]|\(+|\)+|:+|\[+|\]+|{+|\}+|=+|\*+|;+|>+|\++|-+|/+|\'|\"|`")
 
@@ -19,13 +22,16 @@ def tokenize_docstring(docstring: str) -> List[str]:
     return [t for t in DOCSTRING_REGEX_TOKENIZER.findall(str(docstring)) if t is not None and len(t) > 0]
 
 
-def tokenize_code(node, blob: str, nodes_to_exclude: Optional[Set]=None) -> List:
-    tokens = []
-    traverse(node, tokens)
+def tokenize_code(node, blob: str, nodes_to_exclude: Optional[Set]=None, index=None) -> List:
+    tokens = index.get_tokens(node) if index is not None else None
+    if tokens is None:
+        tokens = []
+        traverse(node, tokens)
     # print(tokens)
     # for token in tokens:
     #     print(token.text)
-    return [match_from_span(token, blob) for token in tokens if nodes_to_exclude is None or token not in nodes_to_exclude]
+    view = get_source_view(blob)
+    return [match_from_span(token, view) for token in tokens if nodes_to_exclude is None or token not in nodes_to_exclude]
 
 def nodes_are_equal(n1, n2):
     return n1.type == n2.type and n1.start_point == n2.start_point and n1.end_point == n2.end_point
@@ -34,31 +40,16 @@ def parent_and_previous_sibling(tree, node):
     """Merge `node_parent` and `previous_sibling` function
     """
     parent = node_parent(tree, node)
-    for i, node_at_i in enumerate(parent.children):
-        if nodes_are_equal(node, node_at_i):
-            if i > 0:
-                return parent, parent.children[i-1]
-            return parent, None
-
-    return ValueError("Could not find node in tree.")
+    return parent, node.prev_sibling
 
 
 def previous_sibling(tree, node):
     """
-    Search for the previous sibling of the node.
-    TODO: C TreeSitter should support this natively, but not its Python bindings yet. Replace later.
+    Previous sibling of the node (native tree-sitter link, `tree` is kept for compatibility)
     """
-    to_visit = [tree.root_node]
-    while len(to_visit) > 0:
-        next_node = to_visit.pop()
-        for i, node_at_i in enumerate(next_node.children):
-            if nodes_are_equal(node, node_at_i):
-                if i > 0:
-                    return next_node.children[i-1]
-                return None
-        else:
-            to_visit.extend(next_node.children)
-    return ValueError("Could not find node in tree.")
+    if node.parent is None:
+        return ValueError("Could not find node in tree.")
+    return node.prev_sibling
 
 
 # if parent_node.type == 'variable_declarator':
@@ -87,38 +78,200 @@ def traverse_type_parent(node, kind:List) -> None:
 
 
 def node_parent(tree, node):
-    to_visit = [tree.root_node]
-    while len(to_visit) > 0:
+    """
+    Parent of the node (native tree-sitter link instead of a search from
+    `tree.root_node`, `tree` is kept for compatibility)
+    """
+    parent = node.parent
+    if parent is None:
+        raise ValueError("Could not find node in tree.")
+    return parent
+
+
+# Traversals use an explicit stack (children pushed in reverse to keep the pre-order),
+# deeply nested trees (generated code, long `else if` chains) can not hit the recursion limit
+def traverse(node, results: List) -> None:
+    to_visit = [node]
+    while to_visit:
         next_node = to_visit.pop()
-        for child in next_node.children:
-            if nodes_are_equal(child, node):
-                return next_node
+        if next_node.type == 'string':
+            results.append(next_node)
+            continue
+        children = next_node.children
+        if children:
+            to_visit.extend(reversed(children))
         else:
-            to_visit.extend(next_node.children)
-    raise ValueError("Could not find node in tree.")
+            results.append(next_node)
 
 
-def traverse(node, results: List) -> None:
-    if node.type == 'string':
-        results.append(node)
-        return
-    for n in node.children:
-        traverse(n, results)
-    if not node.children:
-        results.append(node)
-
-
-def traverse_type(node, results, kind:List) -> None:
-    if node.type in kind:
-        results.append(node)
-    if not node.children:
-        return
-    for n in node.children:
-        traverse_type(n, results, kind)
+def traverse_type(node, results, kind:List, index=None) -> None:
+    # Lookup into a `NodeIndex` of the tree if it holds these types
+    if index is not None:
+        found = index.get_type(node, kind)
+        if found is not None:
+            results.extend(found)
+            return
+    to_visit = [node]
+    while to_visit:
+        next_node = to_visit.pop()
+        if next_node.type in kind:
+            results.append(next_node)
+        children = next_node.children
+        if children:
+            to_visit.extend(reversed(children))
+
+
+def traverse_types(node, buckets: Dict[str, List]) -> None:
+    """
+    Single walk version of `traverse_type` for several groups of node types,
+    nodes are appended (in the same order as `traverse_type`) to the list
+    their type maps to
+    
+    Args:
+        node (tree_sitter.Node): root node
+        buckets (Dict[str, List]): node type -> output list (lists can be shared by several types)
+    """
+    to_visit = [node]
+    while to_visit:
+        next_node = to_visit.pop()
+        if next_node.type in buckets:
+            buckets[next_node.type].append(next_node)
+        children = next_node.children
+        if children:
+            to_visit.extend(reversed(children))
+
+
+class SourceView:
+    """
+    Source code split into lines once per file. Pass it instead of the `str` blob
+    (`match_from_span`, parsers, `process_raw_node`) so that each span only
+    costs its own length instead of a split of the whole file
+    
+    Args:
+        blob (str): source code
+    
+    .. code-block:: python
+    
+        >>> view = SourceView(raw_code)
+        >>> match_from_span(function_node, view)
+    """
+    __slots__ = ('blob', 'lines')
+    
+    def __init__(self, blob: str):
+        self.blob = blob
+        self.lines = blob.split('\n')
+    
+    def __str__(self) -> str:
+        return self.blob
+
+
+def get_source_view(blob) -> SourceView:
+    """`SourceView` of a blob, views are returned as is"""
+    if isinstance(blob, SourceView):
+        return blob
+    return SourceView(blob)
+
+
+class NodeIndex:
+    """
+    Nodes of a tree collected in a single `tree_sitter.TreeCursor` walk: nodes
+    of the requested types (bucketed by type) and code tokens (see `traverse`),
+    both in pre-order. The subtree of an indexed node is a range of pre-order
+    positions, so per-function queries (comments, ERROR nodes, tokens) are
+    bisect lookups instead of new traversals. See `LanguageParser.build_index`
+    
+    Args:
+        node (tree_sitter.Node): root node
+        types (Iterable[str]): node types to collect
+    
+    .. code-block:: python
+    
+        >>> index = PythonParser.build_index(tree.root_node)
+        >>> PythonParser.get_comment_node(function_node, index=index)
+    """
+    def __init__(self, node, types: Iterable[str]):
+        self.types = set(types)
+        self._orders = {node_type: [] for node_type in self.types}
+        self._nodes = {node_type: [] for node_type in self.types}
+        self._token_orders = []
+        self._tokens = []
+        # node id -> (first, last) pre-order positions of its subtree, `None` if inside a string
+        self._spans = {}
+        self._walk(node)
+    
+    def _walk(self, root) -> None:
+        types, orders, nodes = self.types, self._orders, self._nodes
+        token_orders, tokens, spans = self._token_orders, self._tokens, self._spans
         
+        cursor = root.walk()
+        order, depth = 0, 0
+        string_depth = None  # tokens stop at string nodes (see `traverse`)
+        opened = []  # (depth, id, first) of indexed nodes whose subtree is being walked
+        while True:
+            node = cursor.node
+            node_type = node.type
+            if node_type in types:
+                orders[node_type].append(order)
+                nodes[node_type].append(node)
+                opened.append((depth, node.id, order if string_depth is None else None))
+            elif depth == 0:
+                opened.append((depth, node.id, order))
+            
+            if string_depth is None and (node_type == 'string' or node.child_count == 0):
+                token_orders.append(order)
+                tokens.append(node)
+                if node_type == 'string':
+                    string_depth = depth
+            order += 1
+            
+            if cursor.goto_first_child():
+                depth += 1
+                continue
+            # Leave the node, then its ancestors until one has a next sibling
+            while True:
+                while opened and opened[-1][0] >= depth:
+                    _, node_id, first = opened.pop()
+                    spans[node_id] = None if first is None else (first, order)
+                if string_depth == depth:
+                    string_depth = None
+                if depth == 0:
+                    return
+                if cursor.goto_next_sibling():
+                    break
+                cursor.goto_parent()
+                depth -= 1
+    
+    def get_type(self, node, kind: Iterable[str]) -> Optional[List]:
+        """Same nodes as `traverse_type(node, results, kind)`, `None` if the index can not tell"""
+        span = self._spans.get(node.id)
+        if span is None or isinstance(kind, str) or any(node_type not in self.types for node_type in kind):
+            return None
+        
+        first, last = span
+        found = []
+        for node_type in kind:
+            orders = self._orders[node_type]
+            start, end = bisect_left(orders, first), bisect_left(orders, last)
+            found.extend(zip(orders[start:end], self._nodes[node_type][start:end]))
+        if len(kind) > 1:
+            found.sort(key=lambda item: item[0])
+        return [item for _, item in found]
+    
+    def get_tokens(self, node) -> Optional[List]:
+        """Same nodes as `traverse(node, results)`, `None` if the index can not tell"""
+        span = self._spans.get(node.id)
+        if span is None:
+            return None
+        if node.type == 'string':
+            return [node]
+        
+        first, last = span
+        start, end = bisect_left(self._token_orders, first), bisect_left(self._token_orders, last)
+        return self._tokens[start:end]
+
 
 def match_from_span(node, blob: str) -> str:
-    lines = blob.split('\n')
+    lines = get_source_view(blob).lines
     line_start = node.start_point[0]
     line_end = node.end_point[0]
     char_start = node.start_point[1]
@@ -130,8 +283,44 @@ def match_from_span(node, blob: str) -> str:
 
 
 class LanguageParser(ABC):
+    FILTER_PATHS = ()
+    FUNCTION_TYPES = ()
+    CLASS_TYPES = ()
+    COMMENT_TYPES = ('comment',)
     BLACKLISTED_FUNCTION_NAMES = []
     
+    @classmethod
+    def build_index(cls, node, language: Optional[tree_sitter.Language]=None):
+        """
+        Collect function, class, comment and ERROR nodes of a tree in a single walk,
+        with `language` they are matched by compiled tree-sitter queries instead (see `QueryIndex`)
+        """
+        if language is not None:
+            return QueryIndex(language)
+        return NodeIndex(node, cls.FUNCTION_TYPES + cls.CLASS_TYPES + cls.COMMENT_TYPES + ('ERROR',))
+    
+    @classmethod
+    def get_node_lists(cls, node, index: Optional[NodeIndex]=None) -> Tuple[List, List]:
+        """
+        Function and class nodes (`get_function_list` and `get_class_list`)
+        collected in a single walk of the tree (or looked up in `index`). Keyword
+        tokens sharing a type name (e.g `class`, `function`) have no children and are dropped
+        
+        Returns:
+            Tuple[List, List]: function nodes, class nodes
+        """
+        function_list = index.get_type(node, cls.FUNCTION_TYPES) if index is not None else None
+        class_list = index.get_type(node, cls.CLASS_TYPES) if index is not None else None
+        if function_list is None or class_list is None:
+            function_list, class_list = [], []
+            buckets = {node_type: function_list for node_type in cls.FUNCTION_TYPES}
+            buckets.update({node_type: class_list for node_type in cls.CLASS_TYPES})
+            traverse_types(node, buckets)
+        
+        function_list = [item for item in function_list if item.children]
+        class_list = [item for item in class_list if item.children]
+        return function_list, class_list
+    
     @staticmethod
     @abstractmethod
     def get_function_list(node):
@@ -149,7 +338,7 @@ class LanguageParser(ABC):
     
     @staticmethod
     @abstractmethod
-    def get_comment_node(node) -> List[tree_sitter.Node]:
+    def get_comment_node(node, index=None) -> List[tree_sitter.Node]:
         pass
     
     @staticmethod
@@ -7,6 +7,9 @@ from .language_parser import LanguageParser, match_from_span, tokenize_code, tok
 
 class PhpParser(LanguageParser):
 
+    FUNCTION_TYPES = ('function_definition', 'method_declaration')
+    CLASS_TYPES = ('class_declaration', 'trait_declaration')
+
     FILTER_PATHS = ('test', 'tests')
 
     BLACKLISTED_FUNCTION_NAMES = ['__construct', '__destruct', '__call', '__callStatic',
@@ -37,21 +40,21 @@ class PhpParser(LanguageParser):
         return docstring_node
     
     @staticmethod
-    def get_comment_node(function_node):
+    def get_comment_node(function_node, index=None):
         comment_node = []
-        traverse_type(function_node, comment_node, kind='comment')
+        traverse_type(function_node, comment_node, PhpParser.COMMENT_TYPES, index=index)
         return comment_node
     
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['class_declaration', 'trait_declaration'])
+        traverse_type(node, res, PhpParser.CLASS_TYPES)
         return res
     
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['function_definition', 'method_declaration'])
+        traverse_type(node, res, PhpParser.FUNCTION_TYPES)
         return res
     
     @staticmethod
@@ -6,6 +6,9 @@ from .language_parser import match_from_span, tokenize_code, tokenize_docstring,
 
 class PythonParser(LanguageParser):
     
+    FUNCTION_TYPES = ('function_definition',)
+    CLASS_TYPES = ('class_definition',)
+    COMMENT_TYPES = ('comment', 'expression_statement')
     BLACKLISTED_FUNCTION_NAMES = ['__init__', '__name__', '__main__']
     
     @staticmethod
@@ -21,13 +24,13 @@ class PythonParser(LanguageParser):
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['function_definition'])
+        traverse_type(node, res, PythonParser.FUNCTION_TYPES)
         return res
 
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['class_definition'])
+        traverse_type(node, res, PythonParser.CLASS_TYPES)
         return res
     
     @staticmethod
@@ -49,9 +52,9 @@ class PythonParser(LanguageParser):
         return None
     
     @staticmethod
-    def get_comment_node(node):
+    def get_comment_node(node, index=None):
         comment_node = []
-        traverse_type(node, comment_node, kind=['comment', 'expression_statement'])
+        traverse_type(node, comment_node, PythonParser.COMMENT_TYPES, index=index)
         for node in comment_node[:]:
             if node.type == 'expression_statement' and node.children[0].type != 'string':
                 comment_node.remove(node)
@@ -0,0 +1,76 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from tree_sitter import Language
+
+
+# (language id, node types) -> compiled query, shared by every index of the process
+_QUERIES: Dict[Tuple[int, Tuple[str, ...]], object] = {}
+_NODE_TYPES: Dict[Tuple[int, str], bool] = {}
+
+
+def is_node_type(language: Language, node_type: str) -> bool:
+    """Whether `node_type` is a named node type of the grammar"""
+    key = (language.language_id, node_type)
+    if key not in _NODE_TYPES:
+        try:
+            language.query(f'({node_type}) @node')
+            _NODE_TYPES[key] = True
+        except NameError:
+            _NODE_TYPES[key] = False
+    return _NODE_TYPES[key]
+
+
+def get_query(language: Language, kind: Iterable[str]):
+    """
+    Compiled query capturing nodes of the given types (compiled once per
+    language and cached), types unknown to the grammar are dropped
+
+    Returns:
+        tree_sitter.Query: query, `None` if no type exists in the grammar
+    """
+    kind = tuple(kind)
+    key = (language.language_id, kind)
+    if key not in _QUERIES:
+        node_types = [node_type for node_type in kind if is_node_type(language, node_type)]
+        if node_types:
+            alternatives = ' '.join(f'({node_type})' for node_type in node_types)
+            _QUERIES[key] = language.query(f'[{alternatives}] @node')
+        else:
+            _QUERIES[key] = None
+    return _QUERIES[key]
+
+
+class QueryIndex:
+    """
+    `NodeIndex` backend running compiled tree-sitter queries: nodes of a type
+    inside a node (functions, classes, comments, ERROR) are matched in C on its
+    subtree, nothing is walked in Python. Captures only match named nodes, so
+    keyword tokens sharing a type name (e.g `class`) are never returned.
+    Tokens are not indexed (`tokenize_code` falls back to `traverse`)
+
+    Args:
+        language (tree_sitter.Language): language of the trees
+
+    .. code-block:: python
+
+        >>> index = PythonParser.build_index(tree.root_node, language=py_language)
+        >>> PythonParser.get_comment_node(function_node, index=index)
+    """
+    def __init__(self, language: Language):
+        self.language = language
+
+    def get_type(self, node, kind: Iterable[str]) -> Optional[List]:
+        """Same nodes as `traverse_type(node, results, kind)` (named nodes only)"""
+        if isinstance(kind, str):
+            return None
+        query = get_query(self.language, kind)
+        if query is None:
+            return []
+
+        # Captures are ordered by position, ancestors first keeps the pre-order of nested nodes
+        found = [item for item, _ in query.captures(node)]
+        found.sort(key=lambda item: (item.start_byte, -item.end_byte))
+        return found
+
+    def get_tokens(self, node) -> Optional[List]:
+        return None
@@ -9,6 +9,9 @@ from .language_parser import LanguageParser, match_from_span, tokenize_code, tok
 
 class RubyParser(LanguageParser):
 
+    FUNCTION_TYPES = ('method',)
+    CLASS_TYPES = ('class', 'module')
+
     FILTER_PATHS = ('test', 'vendor')
 
     BLACKLISTED_FUNCTION_NAMES = ['initialize', 'to_text', 'display', 'dup', 'clone', 'equal?', '==', '<=>',
@@ -17,13 +20,13 @@ class RubyParser(LanguageParser):
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['method'])
+        traverse_type(node, res, RubyParser.FUNCTION_TYPES)
         return res
     
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['class', 'module'])
+        traverse_type(node, res, RubyParser.CLASS_TYPES)
         
         # remove class keywords
         for node in res[:]:
@@ -115,7 +118,7 @@ class RubyParser(LanguageParser):
         
 
     @staticmethod
-    def get_comment_node(function_node):
+    def get_comment_node(function_node, index=None):
         comment_node = []
-        traverse_type(function_node, comment_node, kind='comment')
+        traverse_type(function_node, comment_node, RubyParser.COMMENT_TYPES, index=index)
         return comment_node
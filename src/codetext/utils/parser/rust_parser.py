@@ -8,6 +8,9 @@ from .language_parser import LanguageParser, match_from_span, tokenize_code, tok
 
 class RustParser(LanguageParser):
 
+    FUNCTION_TYPES = ('function_item',)
+    CLASS_TYPES = ('impl_item', 'mod_item')
+
     FILTER_PATHS = ('test', 'vendor')
 
     BLACKLISTED_FUNCTION_NAMES = ['main']
@@ -15,13 +18,13 @@ class RustParser(LanguageParser):
     @staticmethod
     def get_function_list(node):
         res = []
-        traverse_type(node, res, ['function_item'])
+        traverse_type(node, res, RustParser.FUNCTION_TYPES)
         return res
     
     @staticmethod
     def get_class_list(node):
         res = []
-        traverse_type(node, res, ['impl_item', 'mod_item'])  # trait is like an interface
+        traverse_type(node, res, RustParser.CLASS_TYPES)  # trait is like an interface
         return res
 
     @staticmethod
@@ -127,7 +130,7 @@ class RustParser(LanguageParser):
         
 
     @staticmethod
-    def get_comment_node(function_node):
+    def get_comment_node(function_node, index=None):
         comment_node = []
-        traverse_type(function_node, comment_node, kind='comment')
+        traverse_type(function_node, comment_node, RustParser.COMMENT_TYPES, index=index)
         return comment_node
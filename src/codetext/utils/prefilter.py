@@ -0,0 +1,103 @@
+import re
+from typing import Iterable, Optional
+
+
+VENDORED_PATHS = ('vendor', 'vendors', 'node_modules', 'third_party', 'thirdparty', 'site-packages', 'bower_components')
+MINIFIED_SUFFIXES = ('.min.js', '.min.css', '-min.js', '.bundle.js')
+GENERATED_REGEX = re.compile(
+    r"auto-?generated|generated (?:by|from|automatically)|do not (?:edit|modify)",
+    flags=re.IGNORECASE
+)
+GENERATED_HEADER_LINES = 10
+
+
+class PreFilter:
+    """
+    Cheap checks on a raw file (path, size, line length, license) run before
+    tree-sitter parsing. `check` returns the reason a file is dropped,
+    or None if the file must be parsed. Every check is disabled by default
+
+    Args:
+        filter_paths (Iterable[str]): drop files inside one of these directories
+            (e.g `LanguageParser.FILTER_PATHS`, `VENDORED_PATHS`)
+        max_size (int): drop files larger than N bytes (0 to disable)
+        max_line_length (int): drop files having a line longer than N characters,
+            usually minified or generated code (0 to disable)
+        max_mean_line_length (float): drop files with average line length over N (0 to disable)
+        skip_generated (bool): drop minified files (.min.js, ...) and files
+            whose header says it is generated
+        licenses (Iterable[str]): only keep these licenses (case insensitive), None to keep all
+
+    .. code-block:: python
+
+        >>> prefilter = PreFilter(filter_paths=JavaParser.FILTER_PATHS)
+        >>> prefilter.check('src/test/FooTest.java', code)
+        'path'
+    """
+    def __init__(
+        self,
+        filter_paths: Iterable[str]=(),
+        max_size: int=0,
+        max_line_length: int=0,
+        max_mean_line_length: float=0,
+        skip_generated: bool=False,
+        licenses: Optional[Iterable[str]]=None,
+    ):
+        self.filter_paths = set(item.lower() for item in filter_paths)
+        self.max_size = max_size
+        self.max_line_length = max_line_length
+        self.max_mean_line_length = max_mean_line_length
+        self.skip_generated = skip_generated
+        self.licenses = None if licenses is None else set(item.strip().lower() for item in licenses)
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.filter_paths or self.max_size or self.max_line_length or \
+            self.max_mean_line_length or self.skip_generated or self.licenses is not None)
+
+    def check_path(self, path: str) -> bool:
+        """True if one of the parent directories is filtered"""
+        directories = str(path).replace('\\', '/').lower().split('/')[:-1]
+        return any(directory in self.filter_paths for directory in directories)
+
+    def check_lines(self, code: str) -> bool:
+        """True if the longest or the average line is too long"""
+        lines = code.splitlines() or ['']
+        if self.max_line_length and max(len(line) for line in lines) > self.max_line_length:
+            return True
+        if self.max_mean_line_length and len(code) / len(lines) > self.max_mean_line_length:
+            return True
+        return False
+
+    def check_generated(self, path: str, code: str) -> bool:
+        """True if file is minified (by name) or has a "generated" header"""
+        if str(path).lower().endswith(MINIFIED_SUFFIXES):
+            return True
+        header = '\n'.join(code.split('\n', GENERATED_HEADER_LINES)[:GENERATED_HEADER_LINES])
+        return GENERATED_REGEX.search(header) is not None
+
+    def check(self, path: str, code: str, license: Optional[str]=None, size: Optional[int]=None) -> Optional[str]:
+        """
+        Args:
+            path (str): file path in the repo
+            code (str): raw source code
+            license (str): license of the repo (if available)
+            size (int): file size in bytes (computed if not given)
+        Returns:
+            str: reason of dropping ('path', 'size', 'license', 'line_length', 'generated')
+                or None if the file passed every check
+        """
+        if self.filter_paths and self.check_path(path):
+            return 'path'
+        if self.max_size:
+            if size is None:
+                size = len(code.encode('utf8'))
+            if size > self.max_size:
+                return 'size'
+        if self.licenses is not None and str(license).lower() not in self.licenses:
+            return 'license'
+        if (self.max_line_length or self.max_mean_line_length) and self.check_lines(code):
+            return 'line_length'
+        if self.skip_generated and self.check_generated(path, code):
+            return 'generated'
+        return None
@@ -0,0 +1,172 @@
+import json
+import time
+import logging
+import threading
+import multiprocessing
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from tqdm import tqdm
+
+
+PROGRESS_FIELDS = ('samples', 'bytes', 'functions', 'weight')
+
+logger = logging.getLogger('utils')
+
+
+class SharedProgress:
+    """
+    Counters shared by every worker (`multiprocessing.Array`, pass `counters`
+    to the pool initializer). Each process accumulates locally and publishes
+    at most every `flush_interval` seconds to keep lock contention low.
+    `weight` is the part of the task weights (see `--task_size`) already consumed.
+    Values are kept per task (see `set_task`) so that the progress of a task
+    which is run again (retry after a crash) can be dropped with `reset`
+
+    Args:
+        counters (multiprocessing.Array): shared counters, created if None
+        n_tasks (int): number of tasks (counters created only)
+        flush_interval (float): seconds between two publications
+    """
+    def __init__(self, counters=None, n_tasks: int=1, flush_interval: float=0.5):
+        if counters is None:
+            counters = multiprocessing.Array('q', max(1, n_tasks) * len(PROGRESS_FIELDS))
+        self.counters = counters
+        self.flush_interval = flush_interval
+
+        self._offset = 0
+        self._pending = [0] * len(PROGRESS_FIELDS)
+        self._last_flush = time.monotonic()
+
+    def set_task(self, task: int) -> None:
+        """Publish pending values, next ones are added to `task`"""
+        self.flush()
+        self._offset = task * len(PROGRESS_FIELDS)
+
+    def add(self, samples: int=0, bytes: int=0, functions: int=0, weight: int=0) -> None:
+        pending = self._pending
+        pending[0] += samples
+        pending[1] += bytes
+        pending[2] += functions
+        pending[3] += weight
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        with self.counters.get_lock():
+            for idx, value in enumerate(self._pending):
+                self.counters[self._offset + idx] += value
+        self._pending = [0] * len(PROGRESS_FIELDS)
+        self._last_flush = time.monotonic()
+
+    def reset(self, tasks: Iterable[int]) -> None:
+        """Drop the published progress of `tasks` (run again from the start)"""
+        with self.counters.get_lock():
+            for task in tasks:
+                offset = task * len(PROGRESS_FIELDS)
+                self.counters[offset:offset + len(PROGRESS_FIELDS)] = [0] * len(PROGRESS_FIELDS)
+
+    def read(self) -> Dict[str, int]:
+        """Totals of every task"""
+        n_fields = len(PROGRESS_FIELDS)
+        with self.counters.get_lock():
+            values = self.counters[:]
+        return dict(zip(PROGRESS_FIELDS, (sum(values[idx::n_fields]) for idx in range(n_fields))))
+
+
+class ProgressReporter:
+    """
+    Single progress bar of the whole run (instead of one bar per worker) with
+    throughput and ETA, plus a machine-readable `progress {...}` log line
+    every `log_interval` seconds. Runs on a background thread of the main process
+
+    Args:
+        progress (SharedProgress): counters filled by workers
+        total_weight (int): sum of task weights (bytes of input), for the ETA
+        log_interval (float): seconds between two log lines (0 to disable)
+        refresh (float): seconds between two bar updates
+        clock (Callable[[], float]): time source of throughput and ETA
+
+    .. code-block:: python
+
+        >>> with ProgressReporter(progress, total_weight=sum(weights), log_interval=60):
+        ...     run_tasks()
+    """
+    def __init__(
+        self,
+        progress: SharedProgress,
+        total_weight: int,
+        log_interval: float=60,
+        refresh: float=1.0,
+        clock: Callable[[], float]=time.perf_counter
+    ):
+        self.progress = progress
+        self.total_weight = total_weight
+        self.log_interval = log_interval
+        self.refresh = refresh
+        self.clock = clock
+
+        self._start = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._bar = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Current totals, throughput and ETA (seconds, None if unknown)"""
+        values = self.progress.read()
+        elapsed = self.clock() - self._start
+        fraction = min(1., values['weight'] / self.total_weight) if self.total_weight > 0 else 0.
+        eta = elapsed * (1 - fraction) / fraction if fraction > 0 else None
+        return {
+            'elapsed': round(elapsed, 3),
+            'samples': values['samples'],
+            'bytes': values['bytes'],
+            'functions': values['functions'],
+            'samples/s': round(values['samples'] / elapsed, 3) if elapsed > 0 else 0.,
+            'MB/s': round(values['bytes'] / 2**20 / elapsed, 3) if elapsed > 0 else 0.,
+            'progress': round(fraction, 4),
+            'eta': None if eta is None else round(eta, 1),
+        }
+
+    def _update(self, snapshot: Dict[str, Any]) -> None:
+        self._bar.n = min(self.total_weight, self.progress.read()['weight'])
+        self._bar.set_postfix({
+            'samples': snapshot['samples'],
+            'functions': snapshot['functions'],
+            'samples/s': f"{snapshot['samples/s']:.1f}",
+        }, refresh=False)
+        self._bar.refresh()
+
+    def _run(self) -> None:
+        last_log = self.clock()
+        while not self._stop.wait(self.refresh):
+            snapshot = self.snapshot()
+            self._update(snapshot)
+            if self.log_interval > 0 and self.clock() - last_log >= self.log_interval:
+                logger.info('progress %s' % json.dumps(snapshot))
+                last_log = self.clock()
+
+    def start(self) -> None:
+        self._start = self.clock()
+        self._bar = tqdm(total=self.total_weight, unit='B', unit_scale=True, desc='Processing')
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        """Stop reporting, log and return the final snapshot"""
+        if self._thread is None:
+            return None
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        snapshot = self.snapshot()
+        self._update(snapshot)
+        self._bar.close()
+        logger.info('progress %s' % json.dumps(snapshot))
+        return snapshot
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
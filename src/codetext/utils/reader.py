@@ -0,0 +1,149 @@
+import os
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from src.codetext.utils.imports import module_available
+from src.codetext.utils.compression import get_compression, open_file
+from src.codetext.utils.writer import JSON_COLUMNS_KEY
+
+
+_PYARROW_AVAILABLE = module_available("pyarrow")
+
+if _PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+ARROW_EXTENSIONS = ('.arrow', '.parquet')
+
+
+def split_jsonl_by_offset(filepath: str, n_split: int) -> List[Tuple[int, int]]:
+    """
+    Split a .jsonl file into `n_split` byte ranges aligned on line boundaries
+    without loading the file into memory. Compressed file is not seekable
+    and is returned as a single range (0, None)
+
+    Args:
+        filepath (str): path to .jsonl file
+        n_split (int): expected number of ranges
+    Returns:
+        List[Tuple[int, int]]: list of (start, end) byte offsets
+    """
+    if get_compression(filepath) is not None:
+        return [(0, None)]
+    
+    file_size = os.path.getsize(filepath)
+    step = max(1, file_size // max(1, n_split))
+
+    offsets = [0]
+    with open(filepath, 'rb') as file:
+        while offsets[-1] < file_size:
+            file.seek(offsets[-1] + step - 1)
+            file.readline()  # move to the beginning of next line
+            offsets.append(min(file.tell(), file_size))
+
+    return list(zip(offsets[:-1], offsets[1:]))
+
+
+def iter_jsonl(filepath: str, start: int=0, end: Optional[int]=None) -> Iterator[bytes]:
+    """
+    Lazily yield lines of a .jsonl file inside byte range [start, end).
+    Compressed files (.jsonl.gz, .jsonl.zst, .jsonl.xz) are decompressed on
+    the fly and can only be read as a whole
+
+    Args:
+        filepath (str): path to .jsonl file
+        start (int): start offset, must be the beginning of a line
+        end (int): end offset (default to end of file)
+    Returns:
+        Iterator[bytes]: raw json lines (decode with `json.loads`)
+    """
+    if get_compression(filepath) is not None:
+        assert start == 0 and end is None, "Compressed file can not be read by byte range"
+    
+    with open_file(filepath, 'rb') as file:
+        if start > 0:
+            file.seek(start)
+        position = start
+        while end is None or position < end:
+            line = file.readline()
+            if not line:
+                break
+            position += len(line)
+            if line.strip():
+                yield line
+
+
+def list_jsonl_files(data_path: str) -> List[str]:
+    """
+    Find all .json/.jsonl files (compressed or not) under a directory
+
+    Args:
+        data_path (str): data directory
+    Returns:
+        List[str]: sorted file paths
+    """
+    filelist = []
+    for root, _, files in os.walk(data_path):
+        for file in files:
+            compression = get_compression(file)
+            name = file[:-len(compression) - 1] if compression is not None else file
+            if not file.startswith('.') and name.endswith(('.json', '.jsonl')):
+                filelist.append(os.path.join(root, file))
+    return sorted(filelist)
+
+
+def list_arrow_files(data_path: str) -> List[str]:
+    """
+    Find all .arrow (HuggingFace dataset cache) and .parquet files under a directory
+
+    Args:
+        data_path (str): cache directory
+    Returns:
+        List[str]: sorted file paths
+    """
+    filelist = []
+    for root, _, files in os.walk(data_path):
+        for file in files:
+            if file.endswith(ARROW_EXTENSIONS):
+                filelist.append(os.path.join(root, file))
+    return sorted(filelist)
+
+
+def iter_arrow(filepath: str, batch_size: int=1000) -> Iterator[Dict[str, Any]]:
+    """
+    Lazily yield rows of an .arrow or .parquet file, one record batch in memory at a time
+
+    Args:
+        filepath (str): path to .arrow (IPC stream or file) or .parquet file
+        batch_size (int): number of rows per batch (.parquet only)
+    Returns:
+        Iterator[Dict]: rows as python dict
+    """
+    assert _PYARROW_AVAILABLE == True, "`pyarrow` is not installed, try `pip install pyarrow`"
+
+    json_columns = []
+    if filepath.endswith('.parquet'):
+        parquet_file = pq.ParquetFile(filepath)
+        batches = parquet_file.iter_batches(batch_size=batch_size)
+        # Nested columns written as json string by `writer.ParquetWriter`
+        metadata = parquet_file.schema_arrow.metadata or {}
+        json_columns = json.loads(metadata.get(JSON_COLUMNS_KEY, b'[]'))
+    else:
+        source = pa.memory_map(filepath, 'r')
+        try:
+            reader = pa.ipc.open_stream(source)
+        except pa.ArrowInvalid:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(idx) for idx in range(reader.num_record_batches))
+        else:
+            batches = iter(reader)
+
+    for batch in batches:
+        if not json_columns:
+            yield from batch.to_pylist()
+            continue
+        for row in batch.to_pylist():
+            for key in json_columns:
+                if row.get(key) is not None:
+                    row[key] = json.loads(row[key])
+            yield row
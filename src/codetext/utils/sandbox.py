@@ -0,0 +1,130 @@
+import os
+import signal
+import struct
+import threading
+import faulthandler
+from contextlib import contextmanager
+from typing import Set
+
+
+class SampleTimeout(BaseException):
+    """
+    Raised when a sample exceeds its time budget. Not an `Exception`, so that
+    the `except Exception` of the extraction helpers (which skip a node that
+    fails) do not swallow it and the whole sample is stopped
+    """
+
+
+def _raise_timeout(signum, frame):
+    raise SampleTimeout()
+
+
+@contextmanager
+def time_budget(seconds: float, hard_seconds: float=0):
+    """
+    Limit the time spent inside the block.
+
+    After `seconds` a `SampleTimeout` is raised in the block (SIGALRM, checked
+    between python bytecodes only, so a long call into C such as tree-sitter
+    parsing is not interrupted). After `hard_seconds` the whole process is
+    killed (with a traceback on stderr), use it with `InflightJournal` so that
+    the sample is skipped when the task is retried.
+    The soft budget is disabled outside the main thread or on platforms without SIGALRM
+
+    Args:
+        seconds (float): soft budget (0 to disable)
+        hard_seconds (float): hard budget (0 to disable)
+    """
+    soft = seconds > 0 and hasattr(signal, 'SIGALRM') and threading.current_thread() is threading.main_thread()
+    hard = hard_seconds > 0
+
+    if soft:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+    if hard:
+        faulthandler.dump_traceback_later(hard_seconds, exit=True)
+    try:
+        yield
+    finally:
+        if soft:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+        if hard:
+            faulthandler.cancel_dump_traceback_later()
+
+
+class InflightJournal:
+    """
+    Position of the sample being processed, kept on disk (8 bytes rewritten
+    in place) so that a task killed by a hard crash (segfault, hard timeout,
+    out of memory) can skip the offending sample when it is retried.
+    Crashed positions are appended to `<filepath>.crashed` and every one of
+    them is skipped by later attempts (a task with several crashing samples
+    still finishes). The journal is removed once the task is done, use
+    `remove` to drop journals of a previous run
+
+    Args:
+        filepath (str): journal path (one per task)
+
+    .. code-block:: python
+
+        >>> journal = InflightJournal('batch_0.inflight')
+        >>> crashed_positions = journal.load()  # empty if no previous attempt crashed
+        >>> for position, sample in enumerate(dataset):
+        ...     if position in crashed_positions:
+        ...         continue
+        ...     journal.start(position)
+        ...     process(sample)
+        ...     journal.finish()
+        >>> journal.close()  # task done
+    """
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.crashed_path = f'{filepath}.crashed'
+        self._fd = None
+
+    def load(self) -> Set[int]:
+        """Positions of the samples of every crashed previous attempt"""
+        if os.path.exists(self.filepath):
+            with open(self.filepath, 'rb') as file:
+                data = file.read(8)
+            if len(data) == 8:
+                with open(self.crashed_path, 'ab') as file:
+                    file.write(data)
+            os.remove(self.filepath)
+
+        if not os.path.exists(self.crashed_path):
+            return set()
+        with open(self.crashed_path, 'rb') as file:
+            data = file.read()
+        n_position = len(data) // 8
+        return set(struct.unpack(f'<{n_position}q', data[:n_position * 8]))
+
+    def start(self, position: int) -> None:
+        if self._fd is None:
+            self._fd = os.open(self.filepath, os.O_WRONLY | os.O_CREAT, 0o644)
+        os.pwrite(self._fd, struct.pack('<q', position), 0)
+
+    def finish(self) -> None:
+        """Sample done (records written), a crash before the next `start` blames no sample"""
+        if self._fd is not None:
+            os.ftruncate(self._fd, 0)
+
+    def close(self, done: bool=True) -> None:
+        """
+        Remove the journal, crashed positions are kept if the task is not `done`
+        (cleanly interrupted, e.g terminated because another worker crashed)
+        """
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        for path in [self.filepath, self.crashed_path] if done else [self.filepath]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    @staticmethod
+    def remove(filepath: str) -> None:
+        """Delete a journal and its crashed positions (fresh run)"""
+        for path in [filepath, f'{filepath}.crashed']:
+            if os.path.exists(path):
+                os.remove(path)
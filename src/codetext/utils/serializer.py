@@ -0,0 +1,88 @@
+import json
+import math
+from typing import Any, Iterable, Union
+
+from src.codetext.utils.imports import module_available
+
+
+_ORJSON_AVAILABLE = module_available("orjson")
+
+if _ORJSON_AVAILABLE:
+    import orjson
+
+JSON_BACKENDS = ['auto', 'orjson', 'json']
+
+
+def _has_non_finite(item: Any) -> bool:
+    """Whether a NaN or infinite float is nested in `item`"""
+    if isinstance(item, float):
+        return not math.isfinite(item)
+    if isinstance(item, dict):
+        return any(_has_non_finite(value) for value in item.values())
+    if isinstance(item, (list, tuple)):
+        return any(_has_non_finite(value) for value in item)
+    return False
+
+
+class JsonSerializer:
+    """
+    Encode/decode json records with `orjson` when installed, stdlib `json` otherwise.
+
+    The `json` backend is the compatibility mode, its output is byte-identical
+    to `json.dumps(item, ensure_ascii=ensure_ascii)` (previous outputs). `orjson`
+    writes compact utf8 (no space after separators, never escapes non-ascii)
+    and falls back to stdlib for records it can not handle (non-str keys,
+    integers over 64 bits) or would silently change (`orjson` writes NaN and
+    infinity as null, stdlib keeps them). Note that `orjson` decodes integers
+    over 64 bits as float
+
+    Args:
+        backend (str): 'auto' (orjson if installed), 'orjson' or 'json'
+        ensure_ascii (bool): escape non-ascii characters, always uses the `json` backend
+
+    .. code-block:: python
+
+        >>> serializer = JsonSerializer('json')
+        >>> serializer.dumps_lines([{'a': 1}, {'b': 2}])
+        b'{"a": 1}\n{"b": 2}\n'
+    """
+    def __init__(self, backend: str='auto', ensure_ascii: bool=False):
+        if backend not in JSON_BACKENDS:
+            raise ValueError(f"Json backend {backend} not supported, expect one of {JSON_BACKENDS}")
+        if backend == 'orjson':
+            assert _ORJSON_AVAILABLE == True, "`orjson` is not installed, try `pip install orjson`"
+        if backend == 'auto':
+            backend = 'orjson' if _ORJSON_AVAILABLE else 'json'
+        if ensure_ascii:  # orjson has no option to escape non-ascii
+            backend = 'json'
+
+        self.backend = backend
+        self.ensure_ascii = ensure_ascii
+
+    def dumps(self, item: Any) -> bytes:
+        if self.backend == 'orjson':
+            try:
+                data = orjson.dumps(item)
+            except TypeError:  # orjson.JSONEncodeError
+                pass
+            else:
+                # NaN and infinity are written as null, only then is the record walked
+                if b'null' not in data or not _has_non_finite(item):
+                    return data
+        return json.dumps(item, ensure_ascii=self.ensure_ascii).encode('utf8')
+
+    def dumps_lines(self, items: Iterable[Any]) -> bytes:
+        """Encode records as .jsonl lines in a single buffer (one write call)"""
+        lines = [self.dumps(item) for item in items]
+        if not lines:
+            return b''
+        lines.append(b'')
+        return b'\n'.join(lines)
+
+    def loads(self, data: Union[str, bytes]) -> Any:
+        if self.backend == 'orjson':
+            try:
+                return orjson.loads(data)
+            except ValueError:  # orjson.JSONDecodeError, e.g NaN
+                pass
+        return json.loads(data)
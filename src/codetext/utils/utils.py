@@ -1,4 +1,3 @@
-import json
 import os
 import subprocess
 import logging
@@ -9,8 +8,10 @@ import tree_sitter
 from tree_sitter import Language, Parser
 
 from src.codetext.utils.imports import module_available
+from src.codetext.utils.compression import open_file
+from src.codetext.utils.serializer import JsonSerializer
 from src.codetext.utils.noise_removal.noise_removal import check_function, clean_docstring, remove_comment_delimiters
-from src.codetext.utils.parser.language_parser import LanguageParser, match_from_span, tokenize_code, tokenize_docstring, traverse_type
+from src.codetext.utils.parser.language_parser import get_source_view, match_from_span, tokenize_code, tokenize_docstring
 
 
 _DOCSTRING_PARSER_AVAILABLE = module_available("docstring_parser")
@@ -136,13 +137,54 @@ def process_raw_node(tree, blob: str, language_parser, metadata, is_class=False)
     assert isinstance(tree, tree_sitter.Tree), f'Expect tree is `tree_sitter.Tree` type, get {type(tree)}'
     
     try:
-        if is_class:
-            node_list = language_parser.get_class_list(tree.root_node)
-        else:
-            node_list = language_parser.get_function_list(tree.root_node)
+        index = language_parser.build_index(tree.root_node)
+        function_list, class_list = language_parser.get_node_lists(tree.root_node, index)
     except Exception:
         return []
+    node_list = class_list if is_class else function_list
+
+    return process_node_list(node_list, blob, language_parser, metadata, is_class, index)
 
+
+def process_raw_tree(tree, blob: str, language_parser, metadata, levels: List[str]=('function',), language=None) -> Dict[str, List]:
+    """
+    Function, class and inline level extraction sharing a single walk of the tree
+    (see `LanguageParser.build_index`), enabling every level costs one traversal
+    
+    Args:
+        tree (tree_sitter.Tree): Tree AST of source code
+        blob (str): source code
+        language_parser (LanguageParser): Language parser (`utils/parser`)
+        metadata (Dict): file metadata
+        levels (List[str]): any of 'function', 'class', 'inline'
+        language (tree_sitter.Language): (optional) match nodes with compiled queries of this language (see `QueryIndex`)
+    Returns:
+        Dict[str, List]: records of each requested level, same as `process_raw_node`
+            (function and class) and `get_line_definitions` (inline)
+    """
+    assert isinstance(tree, tree_sitter.Tree), f'Expect tree is `tree_sitter.Tree` type, get {type(tree)}'
+    
+    try:
+        index = language_parser.build_index(tree.root_node, language)
+        function_list, class_list = language_parser.get_node_lists(tree.root_node, index)
+    except Exception:
+        index, function_list, class_list = None, [], []
+    
+    # Lines are split once for every level
+    blob = get_source_view(blob)
+    outputs = {}
+    if 'function' in levels:
+        outputs['function'] = list(process_node_list(function_list, blob, language_parser, metadata, index=index))
+    if 'class' in levels:
+        outputs['class'] = list(process_node_list(class_list, blob, language_parser, metadata, is_class=True, index=index))
+    if 'inline' in levels:
+        outputs['inline'] = list(process_line_nodes(function_list, blob, language_parser, metadata, index))
+    return outputs
+
+
+def process_node_list(node_list, blob: str, language_parser, metadata, is_class=False, index=None):
+    """Build records of function (or class) nodes, see `process_raw_node`"""
+    blob = get_source_view(blob)
     outputs = []
     for function in node_list:
         try:
@@ -151,7 +193,7 @@ def process_raw_node(tree, blob: str, language_parser, metadata, is_class=False)
             else:
                 fn_metadata = language_parser.get_function_metadata(function, blob)
 
-            if check_function(function, fn_metadata, language_parser.BLACKLISTED_FUNCTION_NAMES, is_class=is_class):
+            if check_function(function, fn_metadata, language_parser.BLACKLISTED_FUNCTION_NAMES, is_class=is_class, index=index):
                 outputs.append([function, fn_metadata])
             else:
                 continue
@@ -162,7 +204,7 @@ def process_raw_node(tree, blob: str, language_parser, metadata, is_class=False)
     for function, fn_metadata in outputs:
         # TODO: get class name to compare if function is class's constructor
         try:
-            comment_nodes = language_parser.get_comment_node(function)
+            comment_nodes = language_parser.get_comment_node(function, index=index)
             docstring_node = language_parser.get_docstring_node(function)
             
             exclude_node = []
@@ -173,7 +215,7 @@ def process_raw_node(tree, blob: str, language_parser, metadata, is_class=False)
             
             docstring = language_parser.get_docstring(function, blob)
             code = match_from_span(function, blob)
-            code_tokens = tokenize_code(function, blob, exclude_node)
+            code_tokens = tokenize_code(function, blob, exclude_node, index)
             
             comment_list = [match_from_span(cmt, blob) for cmt in comment_nodes]
 
@@ -217,8 +259,9 @@ def get_node_definitions(metadata: List) -> List:
     """
     for node_metadata in metadata:
         code = node_metadata['code']
-        docstring = node_metadata['original_docstring']
-        docstring_tokens = node_metadata['docstring_tokens']
+        # Raw stage records (--cons_from_raw) may omit empty fields
+        docstring = node_metadata.get('original_docstring')
+        docstring_tokens = node_metadata.get('docstring_tokens')
 
         if docstring == None:
             continue
@@ -239,12 +282,13 @@ def get_node_definitions(metadata: List) -> List:
         yield node_metadata
         
 
-def get_line_definitions(tree, blob: str, language_parser):
+def get_line_definitions(tree, blob: str, language_parser, metadata=None):
         """
         Process all extractable functions or class
         Args:
             tree (tree_sitter.Tree): AST of the source code
             blob (str): source code
+            metadata (Dict): (optional) file metadata added to every record
         Returns:
             List contains these keys
                 - 'identifier'
@@ -258,81 +302,100 @@ def get_line_definitions(tree, blob: str, language_parser):
                 - 'comment'
                 - 'comment_tokens'
         """
-        function_list = language_parser.get_function_list(tree.root_node)
-        
+        index = language_parser.build_index(tree.root_node)
+        function_list, _ = language_parser.get_node_lists(tree.root_node, index)
+        return process_line_nodes(function_list, blob, language_parser, metadata, index)
+
+
+def process_line_nodes(function_list, blob: str, language_parser, metadata=None, index=None):
+        """Build inline comment records of function nodes, see `get_line_definitions`"""
+        blob = get_source_view(blob)
         for function_node in function_list:
-            comment_nodes = language_parser.get_comment_node(function_node)
-            
-            if not comment_nodes:
+            try:
+                comment_list = list(_process_line_node(function_node, blob, language_parser, index))
+            except Exception:
                 continue
             
-            comment_metadata = {
-                'identifier': language_parser.get_function_metadata(function_node, blob)['identifier'],
-                'code': match_from_span(function_node, blob),
-                'code_tokens': tokenize_code(function_node, blob, comment_nodes),
-            }
-            
-            fn_line_start = function_node.start_point[0]
-                
-            for comment_node in comment_nodes:
-                _comment_metadata = comment_metadata.copy()
-                
-                comments = [match_from_span(comment_node, blob)]
-                prev_node = comment_node.prev_sibling
-                next_node = comment_node.next_sibling
-                
-                _comment_metadata['prev_context'] = None
-                _comment_metadata['next_context'] = None
-                _comment_metadata['start_point'] = list(comment_node.start_point) #[0] - fn_line_start, comment_node.start_point[1]]
-                _comment_metadata['end_point'] = list(comment_node.end_point) #[0] - fn_line_start, comment_node.end_point[1]]
-                
-                if prev_node is not None:
-                    while prev_node.type == 'comment':
-                        comments.insert(0, match_from_span(prev_node, blob))
-                        _comment_metadata['start_point'] = list(prev_node.start_point)
-                        if prev_node.prev_sibling is None: 
-                            break
-                        prev_node = prev_node.prev_sibling
-
-                    if not prev_node.type == ":":
-                        _comment_metadata['prev_context'] = {
-                            'code': prev_node.text.decode(),
-                            'start_point': list(prev_node.start_point), #[0] - fn_line_start, prev_node.start_point[1]],
-                            'end_point': list(prev_node.end_point) # - fn_line_start, prev_node.end_point[1]]
-                        }
-                
-                if next_node is not None:
-                    while next_node.type == 'comment':
-                        comments.append(match_from_span(next_node, blob))
-                        _comment_metadata['end_point'] = list(next_node.start_point)
-                        if next_node.next_sibling is None:
-                            break
-                        next_node = next_node.next_sibling    
-                        
-                    if next_node.type == "block":
-                        next_node = next_node.children[0] if len(next_node.children) > 0 else None
-                        
-                    _comment_metadata['next_context'] = {
-                        'code': next_node.text.decode(),
-                        'start_point': [next_node.start_point[0] - fn_line_start, next_node.start_point[1]],
-                        'end_point': [next_node.end_point[0] - fn_line_start, next_node.end_point[1]],
-                    }
-                
-                _comment_metadata['start_point'][0] -= fn_line_start
-                _comment_metadata['end_point'][0] -= fn_line_start
-                
-                _cmt = '\n'.join(comments)
-                
-                # change clean_comment -> clean_docstring
-                comment = clean_docstring(_cmt)
-                if comment == None:
-                    continue
+            for comment_metadata in comment_list:
+                if metadata:
+                    comment_metadata.update(metadata)
+                yield comment_metadata
+
+
+def _process_line_node(function_node, blob, language_parser, index=None):
+    """Inline comment records of a single function node"""
+    comment_nodes = language_parser.get_comment_node(function_node, index=index)
+    
+    if not comment_nodes:
+        return
+    
+    comment_metadata = {
+        'identifier': language_parser.get_function_metadata(function_node, blob)['identifier'],
+        'code': match_from_span(function_node, blob),
+        'code_tokens': tokenize_code(function_node, blob, comment_nodes, index),
+    }
+    
+    fn_line_start = function_node.start_point[0]
+        
+    for comment_node in comment_nodes:
+        _comment_metadata = comment_metadata.copy()
+        
+        comments = [match_from_span(comment_node, blob)]
+        prev_node = comment_node.prev_sibling
+        next_node = comment_node.next_sibling
+        
+        _comment_metadata['prev_context'] = None
+        _comment_metadata['next_context'] = None
+        _comment_metadata['start_point'] = list(comment_node.start_point) #[0] - fn_line_start, comment_node.start_point[1]]
+        _comment_metadata['end_point'] = list(comment_node.end_point) #[0] - fn_line_start, comment_node.end_point[1]]
+        
+        if prev_node is not None:
+            while prev_node.type == 'comment':
+                comments.insert(0, match_from_span(prev_node, blob))
+                _comment_metadata['start_point'] = list(prev_node.start_point)
+                if prev_node.prev_sibling is None: 
+                    break
+                prev_node = prev_node.prev_sibling
+
+            if not prev_node.type == ":":
+                _comment_metadata['prev_context'] = {
+                    'code': prev_node.text.decode(),
+                    'start_point': list(prev_node.start_point), #[0] - fn_line_start, prev_node.start_point[1]],
+                    'end_point': list(prev_node.end_point) # - fn_line_start, prev_node.end_point[1]]
+                }
+        
+        if next_node is not None:
+            while next_node.type == 'comment':
+                comments.append(match_from_span(next_node, blob))
+                _comment_metadata['end_point'] = list(next_node.start_point)
+                if next_node.next_sibling is None:
+                    break
+                next_node = next_node.next_sibling    
                 
-                _comment_metadata['original_comment'] = _cmt
-                _comment_metadata['comment'] = comment
-                _comment_metadata['comment_tokens'] = tokenize_docstring(comment)
+            if next_node.type == "block":
+                next_node = next_node.children[0] if len(next_node.children) > 0 else None
                 
-                yield _comment_metadata
+            _comment_metadata['next_context'] = {
+                'code': next_node.text.decode(),
+                'start_point': [next_node.start_point[0] - fn_line_start, next_node.start_point[1]],
+                'end_point': [next_node.end_point[0] - fn_line_start, next_node.end_point[1]],
+            }
+        
+        _comment_metadata['start_point'][0] -= fn_line_start
+        _comment_metadata['end_point'][0] -= fn_line_start
+        
+        _cmt = '\n'.join(comments)
+        
+        # change clean_comment -> clean_docstring
+        comment = clean_docstring(_cmt)
+        if comment == None:
+            continue
+        
+        _comment_metadata['original_comment'] = _cmt
+        _comment_metadata['comment'] = comment
+        _comment_metadata['comment_tokens'] = tokenize_docstring(comment)
+        
+        yield _comment_metadata
 
 
 def extract_node(metadata_list, language:str):
@@ -556,11 +619,11 @@ def extract_docstring(docstring: str, parameter_list: Union[List, Dict], languag
     return metadata
 
 
-def write_jsonl(data, save_path: str):
-    with open(save_path, "a") as file:
-        for item in data:
-            json.dump(item, file, ensure_ascii=False)
-            file.write('\n')
+def write_jsonl(data, save_path: str, serializer: JsonSerializer=None):
+    # .gz, .zst or .xz extension write a new compressed member/frame
+    serializer = serializer or JsonSerializer()
+    with open_file(save_path, "ab") as file:
+        file.write(serializer.dumps_lines(data))
 
 
 if __name__ == '__main__':
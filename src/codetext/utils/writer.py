@@ -0,0 +1,310 @@
+import os
+import json
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+from src.codetext.utils.imports import module_available
+from src.codetext.utils.compression import get_compression, open_file
+from src.codetext.utils.serializer import JsonSerializer
+
+
+_PYARROW_AVAILABLE = module_available("pyarrow")
+
+if _PYARROW_AVAILABLE:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+# --compression -> parquet codec (column chunks are compressed by parquet itself)
+PARQUET_CODECS = {None: 'snappy', 'gz': 'gzip', 'zst': 'zstd'}
+# Schema metadata listing columns stored as json string
+JSON_COLUMNS_KEY = b'codetext.json_columns'
+# Record fields which can hold a mapping (or a mix of str, list and dict depending on the language)
+JSON_COLUMNS = ('parameters', 'docstring_params', 'prev_context', 'next_context')
+
+
+class JsonlWriter:
+    """
+    Buffered .jsonl writer, records are flushed every `buffer_size` items
+    into a temporary file which is renamed to `save_path` on `close()`.
+    A crashed batch never leaves a half-written output behind.
+    Output is compressed on a background thread if `save_path` ends with
+    .gz, .zst or .xz
+
+    Args:
+        save_path (str): output .jsonl path
+        buffer_size (int): number of records kept in memory before flushing
+        level (int): compression level (default of the compressor if None)
+        serializer (JsonSerializer): json encoder (default to fastest available)
+
+    .. code-block:: python
+
+        >>> with JsonlWriter('batch_0_function_data.jsonl') as writer:
+        ...     writer.extend(records)
+    """
+    def __init__(self, save_path: str, buffer_size: int=1000, level: Optional[int]=None, serializer: Optional[JsonSerializer]=None):
+        self.save_path = save_path
+        self.tmp_path = f'{save_path}.tmp'
+        self.buffer_size = max(1, buffer_size)
+        self.count = 0
+        self.serializer = serializer or JsonSerializer()
+
+        self._buffer = []
+        self._hash = hashlib.sha256()
+        self._file = open_file(self.tmp_path, 'wb', compression=get_compression(save_path), level=level, threaded=True)
+
+    def write(self, item: Dict[str, Any]) -> None:
+        self._buffer.append(item)
+        self.count += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> None:
+        for item in items:
+            self.write(item)
+
+    def flush(self) -> None:
+        if self._buffer:
+            data = self.serializer.dumps_lines(self._buffer)
+            self._hash.update(data)
+            self._file.write(data)
+            self._buffer = []
+        self._file.flush()
+
+    @property
+    def checksum(self) -> str:
+        """sha256 of the (uncompressed) records flushed so far, equals `file_checksum` of the closed output"""
+        return self._hash.hexdigest()
+
+    def close(self) -> None:
+        """Flush remaining records and atomically move the output into place"""
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        os.replace(self.tmp_path, self.save_path)
+
+    def abort(self) -> None:
+        """Drop buffered records and the temporary file"""
+        self._buffer = []
+        if not self._file.closed:
+            self._file.close()
+        if os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ParquetWriter:
+    """
+    Columnar counterpart of `JsonlWriter` with the same interface. Records are
+    buffered and written as one row group every `buffer_size` items into a
+    temporary file which is renamed to `save_path` on `close()`.
+    
+    Fields holding nested mappings (`json_columns`, plus any other column
+    seen with a dict) do not have a stable schema and are stored as json
+    string columns (listed in the schema metadata, decoded back by
+    `reader.iter_arrow`), other columns keep their native type so that
+    loaders can read only the columns they need. The schema grows with the
+    records: a column only null so far takes the type of its first values and
+    new keys are added as columns, row groups written before the change are
+    kept in a separate part and cast to the final schema on `close()`
+
+    Args:
+        save_path (str): output .parquet path
+        buffer_size (int): number of rows per row group
+        compression (str): parquet codec ('snappy', 'gzip', 'zstd', ...)
+        level (int): compression level (default of the codec if None)
+        json_columns (Iterable[str]): columns always stored as json string
+
+    .. code-block:: python
+
+        >>> with ParquetWriter('batch_0_function_data.parquet') as writer:
+        ...     writer.extend(records)
+        >>> pq.read_table('batch_0_function_data.parquet', columns=['code', 'docstring'])
+    """
+    def __init__(
+        self,
+        save_path: str,
+        buffer_size: int=1000,
+        compression: str='snappy',
+        level: Optional[int]=None,
+        json_columns: Iterable[str]=JSON_COLUMNS
+    ):
+        assert _PYARROW_AVAILABLE == True, "`pyarrow` is not installed, try `pip install pyarrow`"
+        self.save_path = save_path
+        self.tmp_path = f'{save_path}.tmp'
+        self.buffer_size = max(1, buffer_size)
+        self.compression = compression
+        self.level = level
+        self.count = 0
+
+        self._buffer = []
+        self._schema = None
+        self._json_columns = list(json_columns)
+        self._parts = []
+        self._file = None
+        self._closed = False
+        self._checksum = None
+
+    def write(self, item: Dict[str, Any]) -> None:
+        self._buffer.append(item)
+        self.count += 1
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def extend(self, items: Iterable[Dict[str, Any]]) -> None:
+        for item in items:
+            self.write(item)
+
+    def _update_json_columns(self, rows):
+        for row in rows:
+            for key, value in row.items():
+                if not isinstance(value, dict) or key in self._json_columns:
+                    continue
+                if self._schema is not None and key in self._schema.names \
+                    and not pa.types.is_null(self._schema.field(key).type):
+                    raise ValueError(f"Column `{key}` of {self.save_path} holds both mappings and other values, "
+                                     "add it to `json_columns`")
+                self._json_columns.append(key)
+
+    def _encode(self, rows):
+        encoded = []
+        for row in rows:
+            row = dict(row)
+            for key in self._json_columns:
+                if key in row and row[key] is not None:
+                    row[key] = json.dumps(row[key], ensure_ascii=False)
+            encoded.append(row)
+        return encoded
+
+    def _open_part(self):
+        """Start a new part file with the current schema"""
+        if self._file is not None:
+            self._file.close()
+        path = f'{self.tmp_path}.{len(self._parts)}'
+        schema = self._schema.with_metadata({JSON_COLUMNS_KEY: json.dumps(self._json_columns).encode('utf8')})
+        self._file = pq.ParquetWriter(path, schema, compression=self.compression, compression_level=self.level)
+        self._parts.append(path)
+
+    def flush(self) -> None:
+        if not self._buffer:
+            return
+        self._update_json_columns(self._buffer)
+        table = pa.Table.from_pylist(self._encode(self._buffer))
+        if self._schema is None:
+            self._schema = table.schema
+            self._open_part()
+        else:
+            try:
+                # null -> any type, list<null> -> list<any>, missing fields appended
+                schema = pa.unify_schemas([self._schema, table.schema], promote_options='permissive')
+            except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+                raise ValueError(f"Records do not match the schema of {self.save_path}: {e}") from e
+            if not schema.equals(self._schema):
+                self._schema = schema
+                self._open_part()
+            table = _conform_table(table, self._schema)
+        self._file.write_table(table, row_group_size=len(self._buffer))
+        self._buffer = []
+
+    def _merge_parts(self):
+        """Concatenate the parts into `tmp_path`, row group by row group, cast to the final schema"""
+        schema = self._schema.with_metadata({JSON_COLUMNS_KEY: json.dumps(self._json_columns).encode('utf8')})
+        with pq.ParquetWriter(self.tmp_path, schema, compression=self.compression, compression_level=self.level) as merged:
+            for path in self._parts:
+                part = pq.ParquetFile(path)
+                for idx in range(part.num_row_groups):
+                    table = _conform_table(part.read_row_group(idx), self._schema)
+                    merged.write_table(table, row_group_size=max(1, table.num_rows))
+                part.close()
+                os.remove(path)
+
+    @property
+    def checksum(self) -> str:
+        """sha256 of the closed output file, equals `file_checksum` of the output"""
+        assert self._checksum is not None, "Checksum is available once the writer is closed"
+        return self._checksum
+
+    def close(self) -> None:
+        """Flush remaining records and atomically move the output into place"""
+        if self._closed:
+            return
+        self.flush()
+        if self._file is None:  # no record, still write an empty file
+            self._schema = pa.schema([])
+            self._open_part()
+        self._file.close()
+        if len(self._parts) == 1:
+            os.replace(self._parts[0], self.tmp_path)
+        else:
+            self._merge_parts()
+        self._closed = True
+        self._checksum = file_checksum(self.tmp_path)
+        os.replace(self.tmp_path, self.save_path)
+
+    def abort(self) -> None:
+        """Drop buffered records and the temporary files"""
+        self._buffer = []
+        if self._file is not None and not self._closed:
+            self._file.close()
+        self._closed = True
+        for path in self._parts + [self.tmp_path]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _conform_table(table, schema):
+    """Reorder, cast and null-fill the columns of `table` to `schema`"""
+    columns = []
+    for field in schema:
+        if field.name in table.column_names:
+            column = table.column(field.name)
+            if not column.type.equals(field.type):
+                column = column.cast(field.type)
+        else:
+            column = pa.nulls(table.num_rows, field.type)
+        columns.append(column)
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def open_writer(save_path: str, buffer_size: int=1000, compression: Optional[str]=None, level: Optional[int]=None, serializer: Optional[JsonSerializer]=None):
+    """
+    `ParquetWriter` if `save_path` ends with .parquet else `JsonlWriter`
+
+    Args:
+        save_path (str): output path (.parquet, .jsonl, .jsonl.gz, ...)
+        buffer_size (int): number of records kept in memory before flushing
+        compression (str): `--compression` value (parquet only, .jsonl is compressed by extension)
+        level (int): compression level
+        serializer (JsonSerializer): json encoder (.jsonl only)
+    """
+    if str(save_path).endswith('.parquet'):
+        if compression not in PARQUET_CODECS:
+            raise ValueError(f"Compression {compression} not supported for parquet, expect one of {list(PARQUET_CODECS)}")
+        return ParquetWriter(save_path, buffer_size, PARQUET_CODECS[compression], level)
+    return JsonlWriter(save_path, buffer_size, level, serializer)
+
+
+def file_checksum(filepath: str, chunk_size: int=1 << 20) -> str:
+    """sha256 hex digest of a file (of its decompressed content if compressed)"""
+    file_hash = hashlib.sha256()
+    with open_file(filepath, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
@@ -10,9 +10,15 @@ import pandas as pd
 from tqdm import tqdm
 
 from src.codetext.utils import create_logger
+from src.codetext.utils.compression import open_file
+from src.codetext.utils.reader import iter_arrow
+from src.codetext.utils.writer import PARQUET_CODECS, open_writer
+from src.codetext.utils.serializer import JSON_BACKENDS, JsonSerializer
 
 
 ROOT_PATH = str(Path(__file__).parents[1])
+# Records are encoded and written by chunk of N
+WRITE_BATCH_SIZE = 1000
 
 def seperate_filename(list_filename, parent_path):
     fn_list, cls_list, line_list = [], [], []
@@ -46,6 +52,20 @@ def summary_total(list_file):
     return list_file
 
 
+def load_records(filepath, serializer):
+    """Yield records of a .jsonl (plain or compressed) or .parquet file, malformed lines are skipped"""
+    if filepath.endswith('.parquet'):
+        yield from iter_arrow(filepath)
+        return
+    
+    with open_file(filepath, 'rb') as json_file:
+        for line in json_file:
+            try:
+                yield serializer.loads(line)
+            except Exception:
+                continue
+
+
 def count_param(metadata: dict):
     n_param = 0
     for key, val in metadata.items():
@@ -58,6 +78,14 @@ def count_param(metadata: dict):
 
     return n_param
 
+def write_records(records, file, serializer):
+    """Append records to a binary file (.jsonl) in one write call or to a writer (.parquet)"""
+    if hasattr(file, 'extend'):
+        file.extend(records)
+    elif records:
+        file.write(serializer.dumps_lines(records))
+
+
 def merge_embled_file(file_list, opt, name: str='raw_function', split: bool=False):
     """
     Count number of repo, number of sample
@@ -82,18 +110,18 @@ def merge_embled_file(file_list, opt, name: str='raw_function', split: bool=Fals
     # Deduplicate
     code_base = set()
     docstring_base = set()
-
-    with open(os.path.join(opt.save_path, f'{name}_merge.jsonl'), 'a') as output_file:
+    
+    # Inputs are decompressed by extension, outputs compressed if --compression
+    extension = f'.jsonl.{opt.compression}' if opt.compression else '.jsonl'
+    merge_path = os.path.join(opt.save_path, f'{name}_merge{extension}')
+    # Merged file escapes non-ascii characters (always encoded with stdlib json), final splits do not
+    merge_serializer = JsonSerializer(opt.json_backend, ensure_ascii=True)
+    serializer = JsonSerializer(opt.json_backend)
+
+    with open_file(merge_path, 'ab', level=opt.compression_level, threaded=True) as output_file:
         for file in tqdm(file_list, desc='Merging jsonl file'):
-            with open(file, 'r') as json_file:
-                dataset = list(json_file)
-        
-            for idx, data in enumerate(dataset):
-                try:
-                    data = json.loads(data)
-                except Exception:
-                    continue
-                
+            merged = []
+            for idx, data in enumerate(load_records(file, serializer)):
                 assert 'code' in data.keys()
                 assert 'repo' in data.keys()
                 assert 'path' in data.keys()
@@ -130,14 +158,15 @@ def merge_embled_file(file_list, opt, name: str='raw_function', split: bool=Fals
                 if opt.analyze:
                     zip_output.writestr(unique_idx, code)
             
-                json.dump(data, output_file)
-                output_file.write('\n')
+                merged.append(data)
                 n_sample += 1
+            
+            write_records(merged, output_file, merge_serializer)
 
                 
-    assert os.path.exists(os.path.join(opt.save_path, f'{name}_merge.jsonl')) == True
+    assert os.path.exists(merge_path) == True
     assert os.path.exists(os.path.join(opt.save_path, f'{name}_code.zip')) == True
-    logger.info('Meraged in %s' % (os.path.join(opt.save_path, f'{name}_merge.jsonl')))
+    logger.info('Meraged in %s' % (merge_path))
     logger.info(f"Total number of sample {n_sample} | Deduplicated {n_total_sample-n_sample} samples")
 
     if opt.split and split:
@@ -173,14 +202,23 @@ def merge_embled_file(file_list, opt, name: str='raw_function', split: bool=Fals
 
         df.to_csv(os.path.join(opt.save_path, 'final', 'split_info.csv'), index=False)
             
-        trainfile = open(os.path.join(opt.save_path, 'final', f'{name}_train.jsonl'), "a")
-        validfile = open(os.path.join(opt.save_path, 'final', f'{name}_valid.jsonl'), "a")
-        testfile = open(os.path.join(opt.save_path, 'final', f'{name}_test.jsonl'), "a")
+        # Final splits are either .jsonl (appended) or columnar .parquet (--output_format)
+        if opt.output_format == 'parquet':
+            split_extension = '.parquet'
+            trainfile = open_writer(os.path.join(opt.save_path, 'final', f'{name}_train{split_extension}'), opt.row_group_size, opt.compression, opt.compression_level)
+            validfile = open_writer(os.path.join(opt.save_path, 'final', f'{name}_valid{split_extension}'), opt.row_group_size, opt.compression, opt.compression_level)
+            testfile = open_writer(os.path.join(opt.save_path, 'final', f'{name}_test{split_extension}'), opt.row_group_size, opt.compression, opt.compression_level)
+        else:
+            trainfile = open_file(os.path.join(opt.save_path, 'final', f'{name}_train{extension}'), "ab", level=opt.compression_level, threaded=True)
+            validfile = open_file(os.path.join(opt.save_path, 'final', f'{name}_valid{extension}'), "ab", level=opt.compression_level, threaded=True)
+            testfile = open_file(os.path.join(opt.save_path, 'final', f'{name}_test{extension}'), "ab", level=opt.compression_level, threaded=True)
+        split_files = {'train': trainfile, 'valid': validfile, 'test': testfile}
+        split_records = {set_name: [] for set_name in split_files}
 
-        with open(os.path.join(opt.save_path, f'{name}_merge.jsonl'), 'r') as data_reader:
+        with open_file(merge_path, 'rb') as data_reader:
             dataset = list(data_reader)
         for ids in tqdm(range(len(dataset)), desc='Writing splited dataset'):
-            data = json.loads(dataset[ids])
+            data = serializer.loads(dataset[ids])
             
             repo = data['repo']
             
@@ -189,15 +227,15 @@ def merge_embled_file(file_list, opt, name: str='raw_function', split: bool=Fals
             if repo in df['repo'].values:
                 set_path = df.loc[df['repo'] == repo, 'set'].values[0]
 
-            if set_path == 'train':
-                json.dump(data, trainfile, ensure_ascii=False)
-                trainfile.write('\n')
-            elif set_path == 'test':
-                json.dump(data, testfile, ensure_ascii=False)
-                testfile.write('\n')
-            elif set_path == 'valid':
-                json.dump(data, validfile, ensure_ascii=False)
-                validfile.write('\n')
+            if set_path in split_records:
+                split_records[set_path].append(data)
+                if len(split_records[set_path]) >= WRITE_BATCH_SIZE:
+                    write_records(split_records[set_path], split_files[set_path], serializer)
+                    split_records[set_path] = []
+        
+        for set_name, file in split_files.items():
+            write_records(split_records[set_name], file, serializer)
+            file.close()
     
 
     # Analyze
@@ -300,8 +338,46 @@ if __name__ == '__main__':
         default=20000,
         help='test and valid ratio'
     )
+    
+    # Output settings
+    parser.add_argument(
+        '--compression', 
+        type=str, 
+        default=None,
+        choices=['gz', 'zst', 'xz'],
+        help='Compress merged and splited outputs (.jsonl.gz, .jsonl.zst or .jsonl.xz)'
+    )
+    parser.add_argument(
+        '--json_backend', 
+        type=str, 
+        default='auto',
+        choices=JSON_BACKENDS,
+        help='Json encoder/decoder, `auto` uses orjson if installed, `json` (stdlib) keeps outputs byte-identical to previous versions'
+    )
+    parser.add_argument(
+        '--compression_level', 
+        type=int, 
+        default=None,
+        help='Compression level (default of each compressor if not set)'
+    )
+
+    parser.add_argument(
+        '--output_format', 
+        type=str, 
+        default='jsonl',
+        choices=['jsonl', 'parquet'],
+        help='Save final splits as .jsonl or columnar .parquet'
+    )
+    parser.add_argument(
+        '--row_group_size', 
+        type=int, 
+        default=10000,
+        help='Number of rows per parquet row group'
+    )
 
     opt = parser.parse_args()
+    if opt.output_format == 'parquet' and opt.compression not in PARQUET_CODECS:
+        parser.error(f"--compression {opt.compression} is not supported with --output_format parquet, use gz or zst")
     create_logger(filepath=os.path.join(opt.save_path, 'log', 'post_log.txt'), rank=0)
     
     logger = logging.getLogger()
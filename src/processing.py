@@ -1,17 +1,35 @@
 import os
+import sys
 import argparse
 import time
 import logging
-import json
-import yaml
-from tqdm import tqdm
+import math
+import re
+import zlib
 from pathlib import Path
 
+import numpy as np
+
+import signal
 import multiprocessing
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 
 from datasets import load_dataset
 from tree_sitter import Parser, Language
 from src.codetext.utils.logger import create_logger
+from src.codetext.utils.data_format import DataFormat
+from src.codetext.utils.manifest import Manifest
+from src.codetext.utils.metrics import Metrics, MetricsSaver
+from src.codetext.utils.progress import ProgressReporter, SharedProgress
+from src.codetext.utils.prefilter import VENDORED_PATHS, PreFilter
+from src.codetext.utils.dedup import ContentDedup
+from src.codetext.utils.reader import ARROW_EXTENSIONS, iter_arrow, iter_jsonl, list_arrow_files, list_jsonl_files, split_jsonl_by_offset
+from src.codetext.utils.writer import JsonlWriter, open_writer
+from src.codetext.utils.sandbox import InflightJournal, SampleTimeout, time_budget
+from src.codetext.utils.serializer import JSON_BACKENDS, JsonSerializer
+from src.codetext.utils.compression import get_compression
 
 from src.codetext.utils.parser.go_parser import GoParser
 from src.codetext.utils.parser.cpp_parser import CppParser
@@ -22,10 +40,31 @@ from src.codetext.utils.parser.java_parser import JavaParser
 from src.codetext.utils.parser.python_parser import PythonParser
 from src.codetext.utils.parser.c_sharp_parser import CsharpParser
 from src.codetext.utils.parser.javascript_parser import JavascriptParser
-from src.codetext.utils.utils import build_language, extract_node, get_line_definitions, get_node_definitions, process_raw_node, write_jsonl
+from src.codetext.utils.utils import build_language, extract_node, get_node_definitions, process_raw_tree
 
 
 ROOT_PATH = str(Path(__file__).parents[1])
+LANGUAGE_PARSERS = {
+    'c_sharp': CsharpParser,
+    'c': CppParser,
+    'cpp': CppParser,
+    'python': PythonParser,
+    'java': JavaParser,
+    'javascript': JavascriptParser,
+    'go': GoParser,
+    'ruby': RubyParser,
+    'rust': RustParser,
+    'php': PhpParser,
+}
+
+# Root logger, configured by `create_logger` in the main process
+logger = logging.getLogger()
+_HF_DATASETS = {}
+_WORKER_PARSERS = {}
+_WORKER_LANGUAGES = {}
+# language -> error of a grammar which could not be built, not attempted again
+_UNAVAILABLE_LANGUAGES = {}
+_WORKER_PROGRESS = None
 
 
 def load_json(filepath):
@@ -44,207 +83,702 @@ def main(opt):
         
     if opt.load_from_file:
         logger.info("============ Load dataset from file %s ... ============" % opt.data_path)
-        if not str(opt.data_path).endswith(('json', 'jsonl')):
-            raise ValueError("Not found `json` or `jsonl` file, instead found %s" % opt.data_path)
+        if os.path.isdir(opt.data_path):
+            filelist = list_jsonl_files(opt.data_path)
+            if not filelist:
+                raise ValueError("Not found `json` or `jsonl` file in %s" % opt.data_path)
+        else:
+            compression = get_compression(opt.data_path)
+            if not str(opt.data_path).endswith(('json', 'jsonl', f'json.{compression}', f'jsonl.{compression}')):
+                raise ValueError("Not found `json` or `jsonl` file, instead found %s" % opt.data_path)
+            filelist = [opt.data_path]
+        if len(filelist) == 1 and get_compression(filelist[0]) is not None:
+            logger.warning("Compressed file can not be split, pass a directory of files to --load_from_file to use multiple workers")
         
-        with open(opt.data_path, 'r') as json_file:
-            dataset = list(json_file)
+        # Lazily walk the files, each job only holds its byte range (a whole file if compressed),
+        # --n_split tasks are shared among files by size
+        file_sizes = [os.path.getsize(filepath) for filepath in filelist]
+        total_size = sum(file_sizes)
+        shards, weights = [], []
+        for filepath, file_size in zip(filelist, file_sizes):
+            if opt.task_size > 0:
+                n_task = get_n_task(file_size, opt)
+            else:
+                n_task = max(1, round(opt.n_split * file_size / max(1, total_size)))
+            for start, end in split_jsonl_by_offset(filepath, n_task):
+                shards.append({'path': filepath, 'start': start, 'end': end})
+                weights.append(file_size if end is None else end - start)
+        logger.info("Load dataset done. Spliting %i bytes of %i files into %i sub-dataset" % (total_size, len(filelist), len(shards)))
             
-    elif opt.cons_from_raw:
+    elif opt.cons_from_raw or opt.cons_from_filtered:
         logger.info("============ Load dataset from dir %s ... ============" % opt.data_path)
         assert os.path.exists(opt.data_path) and os.path.isdir(opt.data_path)
-        dataset = [os.path.join(opt.data_path, item) for item in os.listdir(opt.data_path)]
-        # for file in tqdm(filelist):
-        #     with open(os.path.join(opt.data_path, file), 'r') as json_file:
-        #         dataset.extend(json_file)
-
-        # executor = multiprocessing.Pool(n_worker)
-        # for res in executor.starmap(load_json, filelist):
-        #     dataset.extend(res)
-        # dataset = list(dataset)
+        # Each function batch file of the previous stage is a shard
+        shards = [get_stage_shard(os.path.join(opt.data_path, item)) \
+            for item in sorted(os.listdir(opt.data_path)) if not item.startswith(('.', 'manifest', 'metrics')) \
+            and '_class_data' not in item and '_line_data' not in item]
+        weights = [os.path.getsize(shard['path']) for shard in shards]
+        logger.info("Load dataset done. Number of file: %i ============" % len(shards))
+        
+    elif opt.load_from_cache:
+        logger.info("============ Load dataset from cache files in %s ... ============" % opt.data_path)
+        assert os.path.exists(opt.data_path) and os.path.isdir(opt.data_path)
+        # Each worker owns whole .arrow/.parquet files, nothing is indexed up front
+        shards = [{'path': filepath} for filepath in list_arrow_files(opt.data_path)]
+        weights = [os.path.getsize(shard['path']) for shard in shards]
+        logger.info("Found %i cache files ============" % len(shards))
+        
     else:
         logger.info("============ Load dataset from HuggingFace %s ... ============" % opt.data_path)
-        dataset = load_dataset("codeparrot/github-code", languages=[opt.language], split='train', cache_dir=opt.data_path)
-    logger.info("Load dataset done. Number of sample: %i ============" % len(dataset))
-
+        # Download and prepare the cache once, workers memory-map their own shard
+        dataset = load_hf_dataset(opt.data_path, opt.language)
+        logger.info("Load dataset done. Number of sample: %i ============" % len(dataset))
+        shards, weights = split_hf_dataset(dataset, opt)
+    
+    # Dispatch order only, batch index stays the position in the dataset
+    if opt.largest_first:
+        order = sorted(range(len(shards)), key=lambda idx: weights[idx], reverse=True)
+    else:
+        order = range(len(shards))
+    logger.info("Task size: min %i | max %i | total %i (bytes)" % (min(weights, default=0), max(weights, default=0), sum(weights)))
+    
+    # Compile data format once and fail fast on schema mismatch, stage outputs have their own schema
+    assert os.path.exists(opt.data_format), "Not found data format (.yaml file)"
+    data_format = DataFormat.from_yaml(opt.data_format)
+    input_stage, run_stages, save_stages = get_stages(opt)
+    logger.info("Stages: %s -> %s | Saving %s" % (input_stage or 'source', ', '.join(run_stages), ', '.join(save_stages)))
+    if input_stage is None:
+        for shard in shards:
+            first_sample = next(load_shard(shard, opt), None)
+            if first_sample is not None:
+                data_format.validate(first_sample)
+                break
     
     # start_executor(dataset, language, save_path, split, is_file)
     logger.info("============ Start multiprocessing using %i worker ============" % n_worker)
     
-    # split dataset
-    dataset_size = len(dataset)
-    index_list = range(dataset_size)
-    chunk_size = dataset_size//opt.n_split
-    if opt.cons_from_raw:
-        chunk_size = 1
+    # Skip shards finished by a previous run (--resume), the others are redone from scratch
+    suffix = get_shard_suffix(opt)
+    manifest = Manifest(os.path.join(opt.save_path, f'manifest{suffix}.jsonl'), resume=opt.resume)
+    # Crashed samples of a previous run are only skipped with --resume
+    if not opt.resume:
+        clear_quarantine(opt)
     
-    logger.info("Spliting %i samples into %i sub-dataset with chunk size %i" % (dataset_size, opt.n_split, chunk_size))
+    # Content hashes seen by every worker (--dedup), kept with --resume
+    if opt.dedup:
+        dedup_path = get_dedup_path(opt)
+        if not opt.resume:
+            ContentDedup.remove(dedup_path)
+        dedup = ContentDedup(dedup_path)
+        logger.info("Deduplicate files by content | %i hashes in %s" % (len(dedup), dedup_path))
+        dedup.close()
     
-    jobs_list = [index_list[x:x+chunk_size] for x in range(0, dataset_size, chunk_size)]  # n set
+    order = get_node_tasks(order, len(shards), opt)
+    
+    # Only shard descriptors are sent to workers, each worker reads its own slice
     args = []
-    for idx, job_index in enumerate(jobs_list):
-        args.append([dataset, job_index, opt, idx]) # opt.language, opt.save_path, idx, is_file])
-    logger.info("Total %i processes" % len(args))
+    for idx in order:
+        shard = shards[idx]
+        if manifest.is_done(idx, shard):
+            continue
+        args.append([shard, data_format, opt, idx])
+    logger.info("Total %i processes | Skipped %i finished shards" % (len(args), len(order) - len(args)))
+    
+    # Build (or fail on unsupported) languages listed in --language before spawning workers,
+    # grammars of `--language all` are built on first use (records of a missing one are skipped).
+    # Stage inputs (--cons_from_raw, --cons_from_filtered) are not parsed, no grammar is needed
+    languages = (get_languages(opt) or []) if input_stage is None else []
+    for language in languages:
+        get_parser(language)
+    # Metrics of finished tasks and partial metrics of running ones are saved periodically
+    metrics_path = os.path.join(opt.save_path, f'metrics{suffix}.json')
+    saver = MetricsSaver(metrics_path, get_partial_metrics_dir(opt), opt.metrics_interval)
+    saver.start(start)
+    
+    # Workers feed shared counters, a single bar reports the whole run
+    progress = SharedProgress(n_tasks=len(shards))
+    reporter = ProgressReporter(progress, sum(weights[arg[3]] for arg in args), opt.progress_interval)
+    reporter.start()
     
-    executor = multiprocessing.Pool(n_worker)
-    executor.starmap(processing, args)
+    # A worker killed by a hard crash breaks the pool, unfinished tasks are retried
+    # in a new pool and the crashed one skips its offending sample (see `InflightJournal`).
+    # A task raising an error is not retried, it is left out of the manifest for --resume
+    failed = set()
+    for attempt in range(opt.max_retries + 1):
+        if attempt > 0:
+            logger.warning("Worker crashed | Retry %i unfinished tasks (attempt %i/%i)" % (len(args), attempt, opt.max_retries))
+        
+        finished = set()
+        with ProcessPoolExecutor(n_worker, initializer=init_worker, initargs=(languages, progress.counters)) as executor:
+            futures = {executor.submit(_processing_job, arg): arg[3] for arg in args}
+            for future in as_completed(futures):
+                try:
+                    idx, list_res, outputs, task_metrics = future.result()
+                except BrokenProcessPool:
+                    continue
+                except Exception as error:
+                    logger.error("Task %i failed: %r" % (futures[future], error))
+                    failed.add(futures[future])
+                    continue
+                finished.add(idx)
+                if not count_by_line(shards[idx]):
+                    progress.set_task(idx)
+                    progress.add(weight=weights[idx])
+                    progress.flush()
+                manifest.add(idx, shards[idx], list_res, outputs)
+                saver.finish(idx, task_metrics)
+        
+        # Unfinished tasks start over, so does their progress
+        progress.reset(arg[3] for arg in args if arg[3] not in finished)
+        saver.drop(arg[3] for arg in args if arg[3] not in finished)
+        args = [arg for arg in args if arg[3] not in finished and arg[3] not in failed]
+        if not args:
+            break
+    reporter.stop()
+    if args:
+        logger.error("%i tasks failed after %i retries, run again with --resume" % (len(args), opt.max_retries))
+    if failed:
+        logger.error("%i tasks raised an error (%s), run again with --resume" % (len(failed), ', '.join(map(str, sorted(failed)))))
 
     # # for debuging
-    # processing(dataset, jobs_list[0], opt)
+    # processing(shards[0], opt)
     
     finish = time.perf_counter()
+    saver.stop()
+    metrics = saver.metrics
+    logger.info("Saved metrics in %s" % metrics_path)
+    if metrics.counters['prefilter/bytes_saved'] > 0:
+        n_dropped = sum(value for key, value in metrics.counters.items() if key.startswith('prefilter/') and key != 'prefilter/bytes_saved')
+        logger.info("Pre-filter skipped %i files | Saved parsing %.2f MB" % (n_dropped, metrics.counters['prefilter/bytes_saved'] / 2**20))
     logger.info("============ Processing done, finished in %.3f seconds ============" % (finish - start))
+    # Non-zero exit status if some tasks failed for good
+    return 1 if args or failed else 0
+    
+
+def load_hf_dataset(cache_dir, language):
+    """Load codeparrot/github-code from cache (memory-mapped, cached per process)"""
+    key = (cache_dir, language)
+    if key not in _HF_DATASETS:
+        languages = [item.strip() for item in str(language).split(',')]
+        _HF_DATASETS[key] = load_dataset("codeparrot/github-code", languages=languages, split='train', cache_dir=cache_dir)
+    return _HF_DATASETS[key]
+
+
+def get_n_task(total_bytes, opt):
+    """Number of tasks, `--task_size` MB of code per task or `--n_split` if not set"""
+    if opt.task_size > 0:
+        return max(1, math.ceil(total_bytes / (opt.task_size * 2**20)))
+    return opt.n_split
+
+
+def split_hf_dataset(dataset, opt):
+    """
+    Cut HuggingFace dataset into contiguous row ranges of roughly equal code
+    bytes (using `size` column if available, else equal number of rows)
+    
+    Returns:
+        Tuple[List[Dict], List[int]]: shard descriptors and their weights
+    """
+    n_row = len(dataset)
+    if 'size' in dataset.column_names:
+        cumsum = np.cumsum(dataset.data.column('size').to_numpy())
+    else:
+        cumsum = np.arange(1, n_row + 1)
+    total_bytes = int(cumsum[-1]) if n_row > 0 else 0
+    
+    n_task = get_n_task(total_bytes, opt)
+    bounds = np.searchsorted(cumsum, np.arange(1, n_task) * total_bytes / n_task, side='right')
+    bounds = sorted(set([0, *bounds.tolist(), n_row]))
+    
+    shards, weights = [], []
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        shards.append({'path': opt.data_path, 'rows': [start, end]})
+        weights.append(int(cumsum[end - 1] - (cumsum[start - 1] if start > 0 else 0)))
+    return shards, weights
+
+
+def load_shard(shard, opt):
+    """
+    Lazily yield samples described by a shard descriptor
     
+    Args:
+        shard (Dict): either {'path', 'start', 'end'} for a .jsonl byte range,
+            {'path', 'rows'} for a range of rows of HuggingFace dataset
+            or {'path'} for a whole .arrow/.parquet cache file
+        opt (argparse.Namespace): execute arguments
+    """
+    if 'rows' in shard:
+        dataset = load_hf_dataset(shard['path'], opt.language)
+        yield from dataset.select(range(*shard['rows']))
+    elif shard['path'].endswith(ARROW_EXTENSIONS):
+        # Raw cache files may hold other languages
+        languages = get_languages(opt)
+        for data in iter_arrow(shard['path'], opt.buffer_size):
+            if languages is None or 'language' not in data or normalize_language(data['language']) in languages:
+                yield data
+    else:
+        serializer = JsonSerializer(opt.json_backend)
+        # Progress of uncompressed .jsonl is counted by line, the others once the task is done
+        progress = _WORKER_PROGRESS if count_by_line(shard) else None
+        for line in iter_jsonl(shard['path'], shard['start'], shard['end']):
+            if progress is not None:
+                progress.add(weight=len(line))
+            yield serializer.loads(line)
+
+
+def get_stage_shard(filepath):
+    """Shard descriptor of a whole output file of a previous run (.jsonl or .parquet)"""
+    if filepath.endswith(ARROW_EXTENSIONS):
+        return {'path': filepath}
+    return {'path': filepath, 'start': 0, 'end': None}
+
 
-def processing(dataset, job_index, opt, idx=1): #language, save_path, idx=None, is_file=None):
-    # setup language parser
-    language = str(opt.language).lower()
+def count_by_line(shard):
+    """Whether progress (in task weight) of a shard is reported line by line"""
+    return 'end' in shard and get_compression(shard['path']) is None
+
+
+def normalize_language(language):
+    """Lowercase language name, `c++` -> `cpp` and `c#` -> `c_sharp`"""
+    language = str(language).lower()
     if language == "c++": language = "cpp"
     if language == "c#": language = "c_sharp"
+    return language
+
+
+def get_languages(opt):
+    """
+    Languages of `--language` (comma separated list, e.g: Python,Java)
     
-    ast_parser = Parser()
-    lang_path = os.path.join(ROOT_PATH, 'tree-sitter', f'{language}.so')
-    if not os.path.exists(lang_path):
-        logger.info("Language %s not found | Attempt to build it" % (opt.language))
-        build_language(language)
-        
-    tree_language = Language(lang_path, language)
-    ast_parser.set_language(tree_language)
+    Returns:
+        List[str]: normalized language names, `None` for `--language all`
+    """
+    if str(opt.language).lower() == 'all':
+        return None
+    return [normalize_language(item.strip()) for item in str(opt.language).split(',')]
+
+
+def is_multi_language(opt):
+    """Records are routed by their own language field and outputs split per language"""
+    languages = get_languages(opt)
+    return languages is None or len(languages) > 1
+
+
+EXTRACT_LEVELS = ('function', 'class', 'inline')
+STAGES = ('raw', 'filtered', 'extracted')
+
+
+def get_extract_levels(opt):
+    """Levels of `--extract_levels` (comma separated list of function, class, inline)"""
+    return [item.strip().lower() for item in str(opt.extract_levels).split(',') if item.strip()]
+
+
+def get_stages(opt):
+    """
+    Stages of a run. Inputs of `--cons_from_raw` (`--cons_from_filtered`) are function
+    outputs of a previous run, every upstream stage is skipped (nothing is parsed).
+    `--raw_only` and `--filtered_only` stop after that stage, `--*_only` only saves it
+    (default saves filtered and extracted)
     
-    if language == 'c_sharp':
-        language_parser = CsharpParser()
-        
-    elif language == 'c' or language == 'cpp':
-        language_parser = CppParser()
-        
-    elif language == 'python':
-        language_parser = PythonParser()
+    Returns:
+        Tuple[str, List[str], List[str]]: stage of the inputs (`None` for source files),
+            stages to run and stages to save
+    """
+    input_stage = 'filtered' if opt.cons_from_filtered else 'raw' if opt.cons_from_raw else None
+    only = 'raw' if opt.raw_only else 'filtered' if opt.filtered_only else 'extracted' if opt.extracted_only else None
+    
+    start = 0 if input_stage is None else STAGES.index(input_stage) + 1
+    end = len(STAGES) if only is None else STAGES.index(only) + 1
+    run_stages = list(STAGES[start:end])
+    save_stages = [only] if only is not None else [stage for stage in run_stages if stage != 'raw']
+    return input_stage, run_stages, save_stages
+
 
-    elif language == 'java':
-        language_parser = JavaParser()
+def get_parser(language):
+    """
+    Get tree-sitter `Parser` and `LanguageParser` of a language, both are built
+    on first use once per process and reused for every task
+    
+    Args:
+        language (str): language name (e.g: Python, C++, C#)
+    Returns:
+        Tuple[tree_sitter.Parser, LanguageParser]
+    Raises:
+        ValueError: language not supported or its grammar can not be built
+    """
+    language = normalize_language(language)
     
-    elif language == 'javascript':
-        language_parser = JavascriptParser()
+    if language not in _WORKER_PARSERS:
+        if language not in LANGUAGE_PARSERS:
+            raise ValueError(f'Language {language} not supported')
+        if language in _UNAVAILABLE_LANGUAGES:
+            raise ValueError(_UNAVAILABLE_LANGUAGES[language])
         
-    elif language == 'go':
-        language_parser = GoParser()
+        ast_parser = Parser()
+        lang_path = os.path.join(ROOT_PATH, 'tree-sitter', f'{language}.so')
+        try:
+            if not os.path.exists(lang_path):
+                logger.info("Language %s not found | Attempt to build it" % (language))
+                build_language(language)
+            tree_language = Language(lang_path, language)
+        except Exception as e:
+            _UNAVAILABLE_LANGUAGES[language] = f'Unable to build tree-sitter language {language}: {e!r}'
+            logger.warning(_UNAVAILABLE_LANGUAGES[language])
+            raise ValueError(_UNAVAILABLE_LANGUAGES[language]) from e
         
-    elif language == 'ruby':
-        language_parser = RubyParser()
+        ast_parser.set_language(tree_language)
         
-    elif language == 'rust':
-        language_parser = RustParser()
+        _WORKER_PARSERS[language] = (ast_parser, LANGUAGE_PARSERS[language]())
+        _WORKER_LANGUAGES[language] = tree_language
+    
+    return _WORKER_PARSERS[language]
 
-    elif language == 'php':
-        language_parser = PhpParser()
-        
-    else:
-        raise ValueError(f'Language {language} not supported')
+
+def get_query_language(language, opt):
+    """tree-sitter `Language` matching nodes with compiled queries (`--node_backend query`), `None` for the cursor walk"""
+    if opt.node_backend != 'query':
+        return None
+    language = normalize_language(language)
+    get_parser(language)
+    return _WORKER_LANGUAGES[language]
+
+
+def get_output_extension(opt):
+    """`.parquet` or `.jsonl` (`.jsonl.gz`, ... if --compression)"""
+    if opt.output_format == 'parquet':
+        return '.parquet'
+    return f'.jsonl.{opt.compression}' if opt.compression else '.jsonl'
+
+
+def get_shard_suffix(opt):
+    """Suffix of output names of this node, empty if not sharded"""
+    if opt.num_shards > 1:
+        return f'_shard_{opt.shard_id}_of_{opt.num_shards}'
+    return ''
+
+
+def get_partial_metrics_dir(opt):
+    """Partial metrics published by running tasks (see `MetricsSaver`)"""
+    return os.path.join(opt.save_path, f'metrics{get_shard_suffix(opt)}.partial')
+
+
+def get_quarantine_dir(opt):
+    return os.path.join(opt.save_path, 'quarantine')
+
+
+def clear_quarantine(opt):
+    """Remove in-flight journals, quarantine files and their temporary files of this node (fresh run)"""
+    quarantine_path = get_quarantine_dir(opt)
+    if not os.path.isdir(quarantine_path):
+        return
+    # Other nodes (--num_shards) share the directory
+    pattern = re.compile(r'batch_\d+(_quarantine)?%s\.(inflight|inflight\.crashed|jsonl)(\.tmp)?' % re.escape(get_shard_suffix(opt)))
+    for name in os.listdir(quarantine_path):
+        if pattern.fullmatch(name):
+            os.remove(os.path.join(quarantine_path, name))
+
+
+def get_dedup_path(opt):
+    return os.path.join(opt.save_path, f'dedup{get_shard_suffix(opt)}.sqlite')
+
+
+def get_node_tasks(order, n_task, opt):
+    """
+    Tasks of this node. With --shard_by range each node only takes every `num_shards`-th
+    task, with --shard_by repo every node reads all tasks and keeps its own repos
+    (see `get_repo_shard`). With fewer tasks than nodes (e.g compressed input is a single
+    task) some nodes would get no task, every node sees the same tasks so they all fall
+    back to repo partitioning (`opt.shard_by` is updated for the workers)
     
-    t_start = time.perf_counter()
-    raw_path = os.path.join(opt.save_path, 'raw')
-    filtered_path = os.path.join(opt.save_path, 'filtered')
-    extracted_path = os.path.join(opt.save_path, 'extracted')
+    Args:
+        order (Iterable[int]): task indices in dispatch order
+        n_task (int): number of tasks
+    Returns:
+        List[int]: task indices of this node
+    """
+    if opt.num_shards <= 1:
+        return list(order)
+    if opt.shard_by == 'range' and n_task < opt.num_shards:
+        logger.warning("%i tasks for %i shards | Fall back to --shard_by repo" % (n_task, opt.num_shards))
+        opt.shard_by = 'repo'
+    logger.info("Node shard %i of %i (by %s)" % (opt.shard_id, opt.num_shards, opt.shard_by))
+    if opt.shard_by == 'range':
+        return [idx for idx in order if idx % opt.num_shards == opt.shard_id]
+    return list(order)
+
+
+def get_repo_shard(repo, num_shards):
+    """Node owning `repo` (stable across processes and machines, unlike `hash`)"""
+    return zlib.crc32(str(repo).encode('utf8')) % num_shards
+
+
+def get_prefilter(language, opt):
+    """Pre-parse filter of `language` from options (paths from `FILTER_PATHS` of its parser)"""
+    filter_paths = []
+    if opt.filter_paths:
+        filter_paths = [*LANGUAGE_PARSERS[language].FILTER_PATHS, *VENDORED_PATHS]
+    licenses = None
+    if opt.licenses:
+        licenses = [item for item in opt.licenses.split(',') if item.strip()]
     
-    for path in [raw_path, filtered_path, extracted_path]:
-        os.makedirs(path, exist_ok = True)
+    return PreFilter(
+        filter_paths=filter_paths,
+        max_size=int(opt.max_file_size * 2**10),
+        max_line_length=opt.max_line_length,
+        max_mean_line_length=opt.max_mean_line_length,
+        skip_generated=opt.skip_generated,
+        licenses=licenses,
+    )
 
-    list_res = _processing(dataset, job_index, ast_parser, language_parser, idx, opt)
+
+def _exit_on_sigterm(signum, frame):
+    raise SystemExit(128 + signum)
+
+
+def init_worker(languages, counters=None):
+    """Pool initializer, build the parsers of `--language` before any task arrives"""
+    global _WORKER_PROGRESS
+    if counters is not None:
+        _WORKER_PROGRESS = SharedProgress(counters)
+    # Workers terminated because another one crashed exit cleanly (temporary outputs
+    # and in-flight journal are removed), only the crashed task keeps its journal
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    for language in languages:
+        get_parser(language)
+
+
+def processing(shard, data_format, opt, idx=1): #language, save_path, idx=None, is_file=None):
+    t_start = time.perf_counter()
+    if _WORKER_PROGRESS is not None:
+        _WORKER_PROGRESS.set_task(idx)
+
+    list_res, outputs, metrics = _processing(load_shard(shard, opt), data_format, idx, opt)
     
     t_finish = time.perf_counter()
     
     logger.info("Saved batch %i | Processing took %.3f s" % (idx, t_finish - t_start))
     
-    return list_res
+    return idx, list_res, outputs, metrics
+
+
+def _processing_job(args):
+    return processing(*args)
 
 
-def _processing(dataset, indexs, ast, lang_parser, thread_idx, opt): # is_file=None):
-    raw_function_set, raw_class_set, raw_line_set = [], [], []
-    filtered_function_set, filtered_class_set = [], []
-    extracted_function_set, extracted_class_set = [], []
+def _processing(dataset, data_format, thread_idx, opt): # is_file=None):
+    languages = get_languages(opt)
+    multi_language = is_multi_language(opt)
+    levels = get_extract_levels(opt)
+    input_stage, run_stages, save_stages = get_stages(opt)
     
-    if opt.cons_from_raw:
-        with open(dataset[indexs[0]], 'r') as file:
-            dataset = list(file)
-        indexs = range(len(dataset))
-            
-    for idx in tqdm(indexs, desc=f'Thread {thread_idx} processing: '):
-        data = dataset[idx]
-        if opt.load_from_file or opt.cons_from_raw:
-            data = json.loads(data)
-        assert os.path.exists(opt.data_format), "Not found data format (.yaml file)"
-        
-        with open(opt.data_format, 'r') as stream:
-            data_format = yaml.safe_load(stream)
-        
-        # Load using format
-        # Main content
-        repo = data[data_format["repo"]]
-        path = data[data_format["path"]]
-        language = data[data_format["language"]]
-        metadata_data = {"repo": repo, "path": path, "language": language}
-        
-        # Additional content
-        for key in data_format.keys():
-            if key not in ['code', 'repo', 'path', 'language']:
-                metadata_data[key] = data[key]
-        
-        raw_code = data[data_format["code"]]
-        tree = ast.parse(bytes(raw_code, "utf8"))
+    n_records = {}
+    metrics = Metrics()
+    # Partial metrics read by `MetricsSaver` of the main process (not when run outside of `main`)
+    partial_dir = get_partial_metrics_dir(opt)
+    publish_path = None
+    if opt.metrics_interval > 0 and os.path.isdir(partial_dir):
+        publish_path = MetricsSaver.task_path(partial_dir, thread_idx)
+    last_publish = time.perf_counter()
+    progress = _WORKER_PROGRESS or SharedProgress()
+    extension = get_output_extension(opt)
+    serializer = JsonSerializer(opt.json_backend)
+    suffix = get_shard_suffix(opt)
+    shard_by_repo = opt.num_shards > 1 and opt.shard_by == 'repo'
     
-        raw_fn = list(process_raw_node(tree, raw_code, lang_parser, metadata_data))
-
-        # try:
-        # Extract function
-        if opt.cons_from_raw:
-            raw_fn = [data]
-        
-        filtered_fn_list = list(get_node_definitions(raw_fn))
-        extracted_function_list = list(extract_node(filtered_fn_list, language))
-        
-        # For saving
-        raw_function_set.extend(raw_fn)
-        filtered_function_set.extend(filtered_fn_list)
-        extracted_function_set.extend(extracted_function_list)
-        
-        # # Extract line
-        # raw_line = list(get_line_definitions(tree, raw_code, lang_parser, metadata_data))
-        # raw_line_set.extend(raw_line)
-        
-        # # Extract class
-        # if not (language == 'GO' or language == 'C'):
-        #     raw_class = list(process_raw_node(tree, raw_code, lang_parser, metadata_data, is_class=True))
-        #     filtered_class_list = list(get_node_definitions(raw_class, raw_code))
-        #     extracted_class_list = list(extract_node(filtered_class_list, language))
-        
-        #     raw_class_set.extend(raw_class)    
-        #     filtered_class_set.extend(filtered_class_list)
-        #     extracted_class_set.extend(extracted_class_list)
-        # except Exception:
-        #     continue
-        
+    # Records are flushed as they are produced, outputs are moved into place once the batch is done
+    # With multiple languages, outputs are split into <save_path>/<language>/ and opened on first record
+    stack = ExitStack()
+    writers = {}
+    
+    def get_writers(language):
+        if language not in writers:
+            save_path = os.path.join(opt.save_path, language) if multi_language else opt.save_path
+            raw_path = os.path.join(save_path, 'raw')
+            filtered_path = os.path.join(save_path, 'filtered')
+            extracted_path = os.path.join(save_path, 'extracted')
+            
+            for path in [raw_path, filtered_path, extracted_path]:
+                os.makedirs(path, exist_ok = True)
+            
+            # Only levels enabled by `--extract_levels` get a file
+            def open_level(path, level):
+                filepath = os.path.join(path, f'batch_{thread_idx}_{level}_data{suffix}{extension}')
+                return stack.enter_context(open_writer(filepath, opt.buffer_size, opt.compression, opt.compression_level, serializer))
+            
+            stage_paths = {'raw': raw_path, 'filtered': filtered_path, 'extracted': extracted_path}
+            writers[language] = {}
+            for stage in save_stages:
+                for level in ('function', 'class'):
+                    if level in levels:
+                        writers[language][f'{stage}_{level}'] = open_level(stage_paths[stage], level)
+            if 'inline' in levels:
+                writers[language]['raw_line'] = open_level(raw_path, 'line')
+        return writers[language]
     
-    raw_path = os.path.join(opt.save_path, 'raw')
-    filtered_path = os.path.join(opt.save_path, 'filtered')
-    extracted_path = os.path.join(opt.save_path, 'extracted')
+    prefilters = {}
     
-    # write_jsonl(raw_function_set, os.path.join(raw_path, f'batch_{thread_idx}_function_data.jsonl'))
-    # write_jsonl(raw_class_set, os.path.join(raw_path, f'batch_{thread_idx}_class_data.jsonl'))
-    # write_jsonl(raw_line_set, os.path.join(raw_path, f'batch_{thread_idx}_line_data.jsonl'))
+    # Samples over time budget or raising an error are skipped and logged in quarantine,
+    # the sample of a crashed previous attempt (segfault, hard timeout, ...) is skipped too
+    quarantine_path = get_quarantine_dir(opt)
+    os.makedirs(quarantine_path, exist_ok=True)
+    journal = InflightJournal(os.path.join(quarantine_path, f'batch_{thread_idx}{suffix}.inflight'))
+    crashed_positions = journal.load()
+    stack.callback(journal.close, False)
+    quarantine_writer = None
     
-    write_jsonl(filtered_function_set, os.path.join(filtered_path, f'batch_{thread_idx}_function_data.jsonl'))
-    # write_jsonl(filtered_class_set, os.path.join(filtered_path, f'batch_{thread_idx}_class_data.jsonl'))
+    # Byte-identical files (forks, vendored libraries) are parsed once across all workers
+    dedup = None
+    if opt.dedup:
+        dedup = ContentDedup(get_dedup_path(opt))
+        stack.callback(dedup.close)
     
-    write_jsonl(extracted_function_set, os.path.join(extracted_path, f'batch_{thread_idx}_function_data.jsonl'))
-    # write_jsonl(extracted_class_set, os.path.join(extracted_path, f'batch_{thread_idx}_class_data.jsonl'))
+    def quarantine(metadata, content, position, reason, error=None):
+        nonlocal quarantine_writer
+        if quarantine_writer is None:
+            quarantine_writer = stack.enter_context(JsonlWriter(os.path.join(quarantine_path, f'batch_{thread_idx}_quarantine{suffix}.jsonl'), serializer=serializer))
+        # Stage and raw-format records may lack any of these fields
+        logger.warning("Batch %i | Quarantined sample %i (%s) %s/%s" % (thread_idx, position, reason, metadata.get('repo'), metadata.get('path')))
+        metrics.count(f'quarantine/{reason}')
+        # Later copies of the content are parsed instead of being dropped as duplicates
+        if dedup is not None and input_stage is None and dedup.release(content, thread_idx, position):
+            metrics.count('dedup/released')
+        quarantine_writer.write({
+            'repo': metadata.get('repo'),
+            'path': metadata.get('path'),
+            'language': metadata.get('language'),
+            'size': len(content),
+            'batch': thread_idx,
+            'position': position,
+            'reason': reason,
+            'error': None if error is None else repr(error)[:1000],
+        })
+        journal.finish()
     
-    res = []
-    for item in [raw_function_set, raw_class_set, raw_line_set, \
-        filtered_function_set, filtered_class_set, \
-        extracted_function_set, extracted_class_set]:
+    with stack:
+        # Records of a previous stage are not parsed again
+        ast, lang_parser, query_language = None, None, None
+        if not multi_language:
+            if input_stage is None:
+                ast, lang_parser = get_parser(opt.language)
+                query_language = get_query_language(opt.language, opt)
+            level_writers = get_writers(languages[0])
+            record_language = languages[0]
         
-        length = int(len(item))
-        res.append(length)
+        for position, data in enumerate(dataset):
+            # Long tasks show up in metrics.json before they finish
+            if publish_path is not None and time.perf_counter() - last_publish >= opt.metrics_interval:
+                metrics.publish(publish_path)
+                last_publish = time.perf_counter()
+            
+            # Load using format, records of a previous stage are their own metadata
+            if input_stage is None:
+                raw_code, metadata_data = data_format.extract(data)
+            else:
+                raw_code, metadata_data = data['code'], data
+            language = metadata_data["language"]
+            
+            # Repos of other nodes
+            if shard_by_repo and get_repo_shard(metadata_data["repo"], opt.num_shards) != opt.shard_id:
+                metrics.count('other_shard')
+                continue
+            
+            # Route record by its own language
+            if multi_language:
+                record_language = normalize_language(language)
+                if record_language not in LANGUAGE_PARSERS or (languages is not None and record_language not in languages):
+                    metrics.count('skipped_language')
+                    continue
+                if input_stage is None:
+                    try:
+                        ast, lang_parser = get_parser(record_language)
+                    except ValueError:
+                        metrics.count('unavailable_language')
+                        continue
+                    query_language = get_query_language(record_language, opt)
+                level_writers = get_writers(record_language)
+                metrics.count(f'samples/{record_language}')
+            
+            code_bytes = bytes(raw_code, "utf8")
+            metrics.count('samples')
+            metrics.count('bytes', len(code_bytes))
+            progress.add(samples=1, bytes=len(code_bytes))
+            
+            # Drop files by path, size, line length or license before parsing
+            if record_language not in prefilters:
+                prefilters[record_language] = get_prefilter(record_language, opt)
+            prefilter = prefilters[record_language]
+            if prefilter.enabled and input_stage is None:
+                with metrics.timer('prefilter'):
+                    reason = prefilter.check(metadata_data['path'], raw_code, metadata_data.get('license'), len(code_bytes))
+                if reason is not None:
+                    metrics.count(f'prefilter/{reason}')
+                    metrics.count('prefilter/bytes_saved', len(code_bytes))
+                    continue
+            
+            if dedup is not None and input_stage is None:
+                with metrics.timer('dedup'):
+                    duplicate = dedup.is_duplicate(code_bytes, thread_idx, position)
+                if duplicate:
+                    metrics.count('dedup/duplicates')
+                    metrics.count('dedup/bytes_saved', len(code_bytes))
+                    continue
+            
+            if position in crashed_positions:
+                quarantine(metadata_data, code_bytes, position, 'crash')
+                continue
+            
+            journal.start(position)
+            try:
+                with time_budget(opt.sample_timeout, opt.hard_timeout):
+                    if input_stage is None:
+                        with metrics.timer('parse'):
+                            tree = ast.parse(code_bytes)
+                    
+                        with metrics.timer('process_raw_node'):
+                            raw_nodes = process_raw_tree(tree, raw_code, lang_parser, metadata_data, levels, query_language)
+                        records = {f'raw_{level}': raw_nodes[level] for level in ('function', 'class') if level in raw_nodes}
+                        if 'inline' in raw_nodes:
+                            records['raw_line'] = raw_nodes['inline']
+                    else:
+                        # Continue from a stage output, nothing upstream is redone
+                        records = {f'{input_stage}_function': [data]}
+                    
+                    for level in ('function', 'class'):
+                        if 'filtered' in run_stages and f'raw_{level}' in records:
+                            with metrics.timer('get_node_definitions'):
+                                records[f'filtered_{level}'] = list(get_node_definitions(records[f'raw_{level}']))
+                        if 'extracted' in run_stages and f'filtered_{level}' in records:
+                            with metrics.timer('extract_node'):
+                                records[f'extracted_{level}'] = list(extract_node(records[f'filtered_{level}'], language))
+            except SampleTimeout:
+                quarantine(metadata_data, code_bytes, position, 'timeout')
+                continue
+            except Exception as error:
+                quarantine(metadata_data, code_bytes, position, 'error', error)
+                continue
+            
+            # For saving
+            for name, items in records.items():
+                n_records[name] = n_records.get(name, 0) + len(items)
+            progress.add(functions=len(records.get(f'{run_stages[-1]}_function', [])))
+            with metrics.timer('write'):
+                for name, items in records.items():
+                    if name in level_writers:
+                        level_writers[name].extend(items)
+            journal.finish()
+    
+    journal.close()
+    progress.flush()
+    res = [n_records.get(name, 0) for name in \
+        ['raw_function', 'raw_class', 'raw_line', 'filtered_function', 'filtered_class', 'extracted_function', 'extracted_class']]
+    outputs = {writer.save_path: writer.checksum for level_writers in writers.values() for writer in level_writers.values()}
+    if quarantine_writer is not None:
+        outputs[quarantine_writer.save_path] = quarantine_writer.checksum
+    for name in ['raw_function', 'filtered_function', 'extracted_function']:
+        metrics.count(name, n_records.get(name, 0))
+    for name in ['raw_class', 'filtered_class', 'extracted_class', 'raw_line']:
+        if name in n_records:
+            metrics.count(name, n_records[name])
     
     logger.info(
         f'End of batch {thread_idx} \n'
@@ -253,10 +787,11 @@ def _processing(dataset, indexs, ast, lang_parser, thread_idx, opt): # is_file=N
         f'Total extractable function {res[5]} | Total extractable class {res[6]} \n'
     )
     
-    return res
+    return res, outputs, metrics.to_dict()
 
 
-if __name__ == '__main__':
+def get_arg_parser():
+    """Command line options of processing"""
     parser = argparse.ArgumentParser()
     parser.add_argument(
         'data_path', 
@@ -274,7 +809,7 @@ if __name__ == '__main__':
         '--language', 
         type=str, 
         default='Python',
-        help='Declare processing language (e.g: Python, Java)'
+        help='Declare processing language (e.g: Python, Java), a comma separated list (e.g: Python,Java) or `all` to route records by their language field'
     )
     parser.add_argument(
         '--data_format', 
@@ -285,27 +820,188 @@ if __name__ == '__main__':
     parser.add_argument(
         '--load_from_file', 
         action='store_true',
-        help='Load from .json or .jsonl'
+        help='Load from a .json or .jsonl file (or .jsonl.gz, ...), or a directory of them (one task per compressed file)'
+    )
+    parser.add_argument(
+        '--load_from_cache', 
+        action='store_true',
+        help='Stream local .arrow/.parquet cache files (pass folder path to data), one file per task'
     )
     parser.add_argument(
         '--cons_from_raw', 
         action='store_true',
-        help='Continues from raw .jsonl (pass folder path to data)'
+        help='Continues from raw function outputs (pass folder path to data, e.g <save_path>/raw), nothing is parsed'
+    )
+    parser.add_argument(
+        '--cons_from_filtered', 
+        action='store_true',
+        help='Continues from filtered function outputs (pass folder path to data, e.g <save_path>/filtered), only extraction is run'
+    )
+    parser.add_argument(
+        '--extract_levels', 
+        type=str, 
+        default='function',
+        help='Comma separated levels to extract in a single walk of each tree: function, class, inline (e.g: function,class)'
+    )
+    parser.add_argument(
+        '--node_backend', 
+        type=str, 
+        default='cursor',
+        choices=['cursor', 'query'],
+        help='Find function, class, comment and ERROR nodes with a single cursor walk per tree or with compiled tree-sitter queries'
+    )
+    parser.add_argument(
+        '--resume', 
+        action='store_true',
+        help='Skip shards recorded as finished in <save_path>/manifest.jsonl'
     )
     parser.add_argument(
         '--raw_only', 
         action='store_true',
-        help=''
+        help='Stop after raw extraction and save raw functions in <save_path>/raw (input of --cons_from_raw)'
     )
     parser.add_argument(
         '--filtered_only', 
         action='store_true',
-        help=''
+        help='Stop after filtering and only save filtered functions'
     )
     parser.add_argument(
         '--extracted_only', 
         action='store_true',
-        help=''
+        help='Only save extracted functions'
+    )
+    
+    # Output settings
+    parser.add_argument(
+        '--output_format', 
+        type=str, 
+        default='jsonl',
+        choices=['jsonl', 'parquet'],
+        help='Save outputs as .jsonl or as columnar .parquet (one row group per --buffer_size records)'
+    )
+    parser.add_argument(
+        '--buffer_size', 
+        type=int, 
+        default=1000,
+        help='Number of records buffered in memory before flushing to output file'
+    )
+    parser.add_argument(
+        '--json_backend', 
+        type=str, 
+        default='auto',
+        choices=JSON_BACKENDS,
+        help='Json encoder/decoder, `auto` uses orjson if installed, `json` (stdlib) keeps outputs byte-identical to previous versions'
+    )
+    parser.add_argument(
+        '--compression', 
+        type=str, 
+        default=None,
+        choices=['gz', 'zst', 'xz'],
+        help='Compress outputs (.jsonl.gz, .jsonl.zst or .jsonl.xz, gzip or zstd codec for .parquet, default to snappy)'
+    )
+    parser.add_argument(
+        '--compression_level', 
+        type=int, 
+        default=None,
+        help='Compression level (default of each compressor if not set)'
+    )
+    parser.add_argument(
+        '--progress_interval', 
+        type=float, 
+        default=60,
+        help='Log a machine-readable progress line (samples, bytes, functions, throughput, ETA) every N seconds (0 to disable)'
+    )
+    parser.add_argument(
+        '--metrics_interval', 
+        type=float, 
+        default=60,
+        help='Save aggregated timing and throughput metrics (<save_path>/metrics.json) every N seconds, '
+             'running tasks publish their partial metrics as often (0 to save once at the end)'
+    )
+    
+    # Multi-node
+    parser.add_argument(
+        '--num_shards', 
+        type=int, 
+        default=1,
+        help='Total number of nodes sharing the dataset'
+    )
+    parser.add_argument(
+        '--shard_id', 
+        type=int, 
+        default=0,
+        help='Index of this node, in [0, num_shards)'
+    )
+    parser.add_argument(
+        '--shard_by', 
+        type=str, 
+        default='repo',
+        choices=['repo', 'range'],
+        help='Partition by hash of repo (keeps repos together) or by task (every num_shards-th byte range, no record is read twice)'
+    )
+    
+    # Deduplication
+    parser.add_argument(
+        '--dedup', 
+        action='store_true',
+        help='Skip files whose content was already seen (hash set in <save_path>/dedup.sqlite shared by workers), '
+            'which copy is kept depends on scheduling'
+    )
+    
+    # Sample isolation
+    parser.add_argument(
+        '--sample_timeout', 
+        type=float, 
+        default=60,
+        help='Skip (and quarantine) samples taking more than N seconds in python code (0 to disable)'
+    )
+    parser.add_argument(
+        '--hard_timeout', 
+        type=float, 
+        default=300,
+        help='Kill the worker if a sample takes more than N seconds (e.g stuck in tree-sitter), the task is retried without it (0 to disable)'
+    )
+    parser.add_argument(
+        '--max_retries', 
+        type=int, 
+        default=3,
+        help='Number of times tasks of a crashed worker are retried, each retry skips the sample that crashed'
+    )
+    
+    # Pre-parse filter (disabled by default)
+    parser.add_argument(
+        '--filter_paths', 
+        action='store_true',
+        help='Skip files under test and vendored directories (`FILTER_PATHS` of the language parser, node_modules, vendor, ...)'
+    )
+    parser.add_argument(
+        '--max_file_size', 
+        type=float, 
+        default=0,
+        help='Skip files larger than N KB before parsing (0 to disable)'
+    )
+    parser.add_argument(
+        '--max_line_length', 
+        type=int, 
+        default=0,
+        help='Skip files having a line longer than N characters, e.g minified code (0 to disable)'
+    )
+    parser.add_argument(
+        '--max_mean_line_length', 
+        type=float, 
+        default=0,
+        help='Skip files whose average line length is over N characters (0 to disable)'
+    )
+    parser.add_argument(
+        '--skip_generated', 
+        action='store_true',
+        help='Skip minified (.min.js, ...) and auto-generated files'
+    )
+    parser.add_argument(
+        '--licenses', 
+        type=str, 
+        default=None,
+        help='Only keep files under these licenses, comma separated (e.g: mit,apache-2.0)'
     )
     
     # Processing on multiple CPUs
@@ -315,14 +1011,44 @@ if __name__ == '__main__':
         default=40,
         help='Split all the raw data into N file and feed into process pool'
     )
+    parser.add_argument(
+        '--task_size', 
+        type=float, 
+        default=0,
+        help='Cut the dataset into tasks of N MB of code each instead of --n_split equal chunks'
+    )
+    parser.add_argument(
+        '--largest_first', 
+        action='store_true',
+        help='Dispatch the largest tasks first to avoid stragglers'
+    )
     parser.add_argument(
         '--n_core',
         type=int,
         default=1,
         help='Number of maximum process to create'
     )
+    return parser
 
+
+if __name__ == '__main__':
+    parser = get_arg_parser()
     opt = parser.parse_args()
+    if opt.output_format == 'parquet' and opt.compression == 'xz':
+        parser.error("--compression xz is not supported with --output_format parquet, use gz or zst")
+    levels = get_extract_levels(opt)
+    if not levels or any(level not in EXTRACT_LEVELS for level in levels):
+        parser.error(f"--extract_levels must be a list of {', '.join(EXTRACT_LEVELS)}, got {opt.extract_levels}")
+    if (opt.cons_from_raw or opt.cons_from_filtered) and levels != ['function']:
+        parser.error("--cons_from_raw and --cons_from_filtered only continue function level, use --extract_levels function")
+    if opt.cons_from_raw and opt.cons_from_filtered:
+        parser.error("--cons_from_raw and --cons_from_filtered are mutually exclusive")
+    if opt.raw_only + opt.filtered_only + opt.extracted_only > 1:
+        parser.error("Only one of --raw_only, --filtered_only and --extracted_only can be set")
+    if not get_stages(opt)[1]:
+        parser.error("Nothing to run, inputs already are at the requested stage")
+    if not 0 <= opt.shard_id < opt.num_shards:
+        parser.error(f"--shard_id must be in [0, {opt.num_shards}), got {opt.shard_id}")
     
     if not os.path.exists(opt.save_path):
         os.mkdir(opt.save_path)
@@ -334,4 +1060,4 @@ if __name__ == '__main__':
     logger = logging.getLogger()
     logger.info(f'Execute Arguments: {opt}')
 
-    main(opt)
+    sys.exit(main(opt))
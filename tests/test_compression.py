@@ -0,0 +1,49 @@
+'''test for compressed reader and writer'''
+import os
+import json
+import tempfile
+import unittest
+
+from src.codetext.utils.compression import _ZSTANDARD_AVAILABLE, get_compression, open_file
+from src.codetext.utils.reader import iter_jsonl
+from src.codetext.utils.writer import JsonlWriter, file_checksum
+
+
+class Test_Compression(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.samples = [{'identifier': f'func_{idx}', 'docstring': 'Trả về tổng'} for idx in range(300)]
+        self.extensions = ['.jsonl', '.jsonl.gz', '.jsonl.xz']
+        if _ZSTANDARD_AVAILABLE:
+            self.extensions.append('.jsonl.zst')
+        return super().setUp()
+    
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+    
+    def test_get_compression(self):
+        self.assertEqual(get_compression('batch_0_function_data.jsonl.gz'), 'gz')
+        self.assertEqual(get_compression('batch_0_function_data.jsonl.zst'), 'zst')
+        self.assertEqual(get_compression('batch_0_function_data.jsonl.xz'), 'xz')
+        self.assertIsNone(get_compression('batch_0_function_data.jsonl'))
+
+    def test_writer_and_reader(self):
+        for extension in self.extensions:
+            save_path = os.path.join(self.tmp_dir.name, f'batch_0_function_data{extension}')
+            with JsonlWriter(save_path, buffer_size=64, level=1) as writer:
+                writer.extend(self.samples)
+            
+            samples = [json.loads(line) for line in iter_jsonl(save_path)]
+            self.assertEqual(samples, self.samples)
+            self.assertEqual(file_checksum(save_path), writer.checksum)
+    
+    def test_open_file_append(self):
+        for extension in self.extensions:
+            save_path = os.path.join(self.tmp_dir.name, f'append{extension}')
+            for _ in range(2):
+                with open_file(save_path, 'a', threaded=True) as file:
+                    file.write('line\n')
+            
+            with open_file(save_path, 'r') as file:
+                self.assertEqual(list(file), ['line\n', 'line\n'])
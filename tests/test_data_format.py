@@ -0,0 +1,35 @@
+'''test for data format'''
+import unittest
+
+from src.codetext.utils.data_format import DataFormat
+
+
+class Test_DataFormat(unittest.TestCase):
+    def setUp(self) -> None:
+        self.data_format = DataFormat.from_yaml('data/format/codeparot-format.yaml')
+        self.sample = {
+            'code': 'def foo():\n    pass', 
+            'repo_name': 'org/repo', 
+            'path': 'foo.py', 
+            'language': 'Python', 
+            'license': 'mit', 
+            'size': 19,
+        }
+        return super().setUp()
+
+    def test_extract(self):
+        raw_code, metadata = self.data_format.extract(self.sample)
+        
+        self.assertEqual(raw_code, self.sample['code'])
+        self.assertEqual(metadata, {'repo': 'org/repo', 'path': 'foo.py', 'language': 'Python', 'license': 'mit', 'size': 19})
+        self.assertEqual(self.data_format.additional_keys, ['license', 'size'])
+
+    def test_validate(self):
+        self.data_format.validate(self.sample)
+        
+        del self.sample['repo_name']
+        with self.assertRaises(ValueError):
+            self.data_format.validate(self.sample)
+        
+        with self.assertRaises(ValueError):
+            DataFormat({'code': 'code', 'repo': 'repo'})
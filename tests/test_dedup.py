@@ -0,0 +1,63 @@
+'''test for content dedup'''
+import os
+import tempfile
+import unittest
+import multiprocessing
+
+from src.codetext.utils.dedup import ContentDedup
+
+
+def _claim(db_path, batch, queue):
+    dedup = ContentDedup(db_path)
+    queue.put([dedup.is_duplicate(f'content {idx}'.encode(), batch, idx) for idx in range(50)])
+    dedup.close()
+
+
+class Test_Dedup(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'dedup.sqlite')
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def test_duplicate(self):
+        dedup = ContentDedup(self.db_path)
+
+        self.assertFalse(dedup.is_duplicate(b'def foo(): pass', batch=0, position=0))
+        self.assertTrue(dedup.is_duplicate(b'def foo(): pass', batch=1, position=3))
+        self.assertFalse(dedup.is_duplicate(b'def bar(): pass', batch=1, position=4))
+        # Retried task keeps its own samples
+        self.assertFalse(dedup.is_duplicate(b'def foo(): pass', batch=0, position=0))
+        self.assertEqual(len(dedup), 2)
+        # Quarantined owner hands the content over to the next copy
+        self.assertFalse(dedup.release(b'def foo(): pass', batch=1, position=3))
+        self.assertTrue(dedup.release(b'def foo(): pass', batch=0, position=0))
+        self.assertFalse(dedup.is_duplicate(b'def foo(): pass', batch=2, position=1))
+        self.assertTrue(dedup.is_duplicate(b'def foo(): pass', batch=0, position=0))
+        self.assertEqual(len(dedup), 2)
+
+        dedup.close()
+        ContentDedup.remove(self.db_path)
+        self.assertFalse(os.path.exists(self.db_path))
+
+    def test_processes(self):
+        ContentDedup(self.db_path).connection.close()  # create schema once
+
+        queue = multiprocessing.Queue()
+        processes = [multiprocessing.Process(target=_claim, args=(self.db_path, batch, queue)) for batch in range(4)]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        # Every content is kept exactly once
+        for idx in range(50):
+            self.assertEqual(sum(not result[idx] for result in results), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
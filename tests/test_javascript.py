@@ -32,6 +32,14 @@ class Test_JavascriptParser(unittest.TestCase):
         
         self.assertEqual(len(class_list), 2)
 
+    def test_get_node_lists(self):
+        root = self.root_node
+        
+        function_list, class_list = JavascriptParser.get_node_lists(root)
+        
+        self.assertEqual(function_list, JavascriptParser.get_function_list(root))
+        self.assertEqual(class_list, JavascriptParser.get_class_list(root))
+
     def test_get_docstring(self):
         code_sample = """
         /**
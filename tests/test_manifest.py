@@ -0,0 +1,71 @@
+'''test for resume manifest'''
+import os
+import tempfile
+import unittest
+
+from src.codetext.utils.manifest import Manifest
+from src.codetext.utils.writer import file_checksum
+
+
+class Test_Manifest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest_path = os.path.join(self.tmp_dir.name, 'manifest.jsonl')
+        self.output = os.path.join(self.tmp_dir.name, 'filtered', 'batch_0_function_data.jsonl')
+        os.makedirs(os.path.dirname(self.output))
+        with open(self.output, 'w') as file:
+            file.write('{"code": "def foo(): pass"}\n')
+        self.shard = {'path': 'data.jsonl', 'start': 0, 'end': 100}
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def add_entry(self):
+        manifest = Manifest(self.manifest_path)
+        manifest.add(0, self.shard, [1, 0, 0, 1, 0, 1, 0], {self.output: file_checksum(self.output)})
+        return manifest
+
+    def test_is_done(self):
+        self.add_entry()
+        manifest = Manifest(self.manifest_path, resume=True)
+        self.assertTrue(manifest.is_done(0, dict(self.shard)))
+        self.assertFalse(manifest.is_done(1, self.shard))
+        # Input range changed (e.g other --n_split)
+        self.assertFalse(manifest.is_done(0, {'path': 'data.jsonl', 'start': 0, 'end': 50}))
+
+        # Fresh run drops previous entries
+        self.assertFalse(Manifest(self.manifest_path).is_done(0, self.shard))
+        self.assertFalse(os.path.exists(self.manifest_path))
+
+    def test_outputs_changed(self):
+        self.add_entry()
+        with open(self.output, 'a') as file:
+            file.write('{"code": "def bar(): pass"}\n')
+        self.assertFalse(Manifest(self.manifest_path, resume=True).is_done(0, self.shard))
+
+        self.add_entry()
+        os.remove(self.output)
+        self.assertFalse(Manifest(self.manifest_path, resume=True).is_done(0, self.shard))
+
+    def test_torn_line(self):
+        manifest = self.add_entry()
+        manifest.add(1, {'path': 'data.jsonl', 'start': 100, 'end': 200}, [0] * 7, {})
+        # Crash while appending the last entry
+        with open(self.manifest_path, 'rb') as file:
+            data = file.read()
+        with open(self.manifest_path, 'wb') as file:
+            file.write(data[:-20])
+
+        manifest = Manifest(self.manifest_path, resume=True)
+        self.assertTrue(manifest.is_done(0, self.shard))
+        self.assertFalse(manifest.is_done(1, {'path': 'data.jsonl', 'start': 100, 'end': 200}))
+
+        # Entries appended after a torn line are still read
+        manifest.add(1, {'path': 'data.jsonl', 'start': 100, 'end': 200}, [0] * 7, {})
+        self.assertTrue(Manifest(self.manifest_path, resume=True).is_done(1, {'path': 'data.jsonl', 'start': 100, 'end': 200}))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+'''test for run metrics'''
+import os
+import json
+import time
+import tempfile
+import unittest
+
+from src.codetext.utils.metrics import Metrics, MetricsSaver
+
+
+class Test_Metrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.metrics_path = os.path.join(self.tmp_dir.name, 'metrics.json')
+        self.partial_dir = os.path.join(self.tmp_dir.name, 'metrics.partial')
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def _wait_saved(self, samples):
+        for _ in range(200):
+            if os.path.exists(self.metrics_path):
+                with open(self.metrics_path) as file:
+                    if json.load(file)['counters'].get('samples') == samples:
+                        return
+            time.sleep(0.01)
+        self.fail(f'metrics with {samples} samples not saved')
+
+    def test_saver(self):
+        saver = MetricsSaver(self.metrics_path, self.partial_dir, interval=0.01)
+        saver.start()
+
+        # Running tasks are saved before they finish
+        running = Metrics()
+        running.count('samples', 3)
+        running.publish(MetricsSaver.task_path(self.partial_dir, 0))
+        running.publish(MetricsSaver.task_path(self.partial_dir, 1))
+        self._wait_saved(6)
+
+        # Final metrics replace the partial ones, retried tasks start over
+        running.count('samples', 2)
+        saver.finish(0, running.to_dict())
+        saver.drop([1])
+        self._wait_saved(5)
+
+        saver.stop()
+        self.assertFalse(os.path.exists(self.partial_dir))
+        with open(self.metrics_path) as file:
+            self.assertEqual(json.load(file)['counters'], {'samples': 5})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+'''test for pre-parse filter'''
+import unittest
+
+from src.codetext.utils.parser.java_parser import JavaParser
+from src.codetext.utils.prefilter import VENDORED_PATHS, PreFilter
+
+
+class Test_PreFilter(unittest.TestCase):
+    def test_disabled(self):
+        prefilter = PreFilter()
+
+        self.assertFalse(prefilter.enabled)
+        self.assertIsNone(prefilter.check('test/foo.py', 'x' * 10000))
+
+    def test_path(self):
+        prefilter = PreFilter(filter_paths=[*JavaParser.FILTER_PATHS, *VENDORED_PATHS])
+
+        self.assertEqual(prefilter.check('src/test/java/FooTest.java', ''), 'path')
+        self.assertEqual(prefilter.check('web/node_modules/lib/index.js', ''), 'path')
+        self.assertIsNone(prefilter.check('src/main/java/test.java', ''))  # file name is not a directory
+        self.assertIsNone(prefilter.check('src/testing/Foo.java', ''))
+
+    def test_size_and_license(self):
+        prefilter = PreFilter(max_size=10, licenses=['mit', 'Apache-2.0'])
+
+        self.assertEqual(prefilter.check('foo.py', 'x' * 11, 'mit'), 'size')
+        self.assertEqual(prefilter.check('foo.py', 'x', 'gpl-3.0'), 'license')
+        self.assertEqual(prefilter.check('foo.py', 'x', None), 'license')
+        self.assertIsNone(prefilter.check('foo.py', 'x', 'apache-2.0'))
+
+    def test_line_length(self):
+        prefilter = PreFilter(max_line_length=100, max_mean_line_length=50)
+
+        self.assertEqual(prefilter.check('a.js', 'var a=1;' * 20), 'line_length')
+        self.assertEqual(prefilter.check('a.js', ('x' * 60 + '\n') * 3), 'line_length')
+        self.assertIsNone(prefilter.check('a.js', 'x' * 60 + '\n' + 'x\n'))
+        self.assertIsNone(prefilter.check('a.js', ''))
+
+    def test_generated(self):
+        prefilter = PreFilter(skip_generated=True)
+
+        self.assertEqual(prefilter.check('dist/app.min.js', 'var a = 1;'), 'generated')
+        self.assertEqual(prefilter.check('foo_pb2.py', '# Generated by the protocol buffer compiler.  DO NOT EDIT!\n'), 'generated')
+        self.assertIsNone(prefilter.check('foo.py', 'def foo():\n    pass\n'))
+
+
+if __name__ == '__main__':
+    unittest.main()
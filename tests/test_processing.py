@@ -0,0 +1,253 @@
+'''test for processing helpers'''
+import os
+import json
+import tempfile
+import unittest
+from argparse import Namespace
+from concurrent.futures import ProcessPoolExecutor
+
+from src.codetext.utils.data_format import DataFormat
+from src.codetext.utils.compression import open_file
+from src.codetext.utils.reader import iter_jsonl, list_jsonl_files
+from src import processing
+from src.processing import _processing, _processing_job, clear_quarantine, get_stage_shard, init_worker, get_node_tasks, get_stages, get_repo_shard, main, split_hf_dataset, get_arg_parser, load_shard
+
+
+def _run_task(args):
+    # Parser of the worker before and after the task
+    built = processing._WORKER_PARSERS.get('python')
+    idx, counts, _, _ = _processing_job(args)
+    return os.getpid(), id(built), id(processing._WORKER_PARSERS['python']), idx, counts
+
+
+class Test_Processing(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        return super().setUp()
+
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def test_clear_quarantine(self):
+        quarantine_path = os.path.join(self.tmp_dir.name, 'quarantine')
+        os.makedirs(quarantine_path)
+        names = [
+            'batch_0.inflight', 'batch_0.inflight.crashed', 'batch_3_quarantine.jsonl', 'batch_3_quarantine.jsonl.tmp',
+            'batch_0_shard_1_of_2.inflight.crashed', 'batch_1_quarantine_shard_1_of_2.jsonl', 'notes.txt',
+        ]
+        for name in names:
+            open(os.path.join(quarantine_path, name), 'w').close()
+
+        # Files of other nodes are kept
+        clear_quarantine(Namespace(save_path=self.tmp_dir.name, num_shards=1, shard_id=0))
+        self.assertEqual(sorted(os.listdir(quarantine_path)), sorted(names[4:]))
+
+        clear_quarantine(Namespace(save_path=self.tmp_dir.name, num_shards=2, shard_id=1))
+        self.assertEqual(os.listdir(quarantine_path), ['notes.txt'])
+
+    def get_opt(self, *args):
+        return get_arg_parser().parse_args([self.tmp_dir.name, '--save_path', self.tmp_dir.name, *args])
+
+    def test_quarantine_partial_metadata(self):
+        opt = self.get_opt('--cons_from_filtered', '--sample_timeout', '0')
+        # Filtered record without repo, path nor docstring fails in `extract_node`
+        records = [{'code': 'def foo():\n    pass\n', 'language': 'Python'}]
+
+        _, outputs, metrics = _processing(iter(records), None, 0, opt)
+        self.assertEqual(metrics['counters']['quarantine/error'], 1)
+
+        quarantine_file = os.path.join(self.tmp_dir.name, 'quarantine', 'batch_0_quarantine.jsonl')
+        self.assertIn(quarantine_file, outputs)
+        entry = json.loads(next(iter_jsonl(quarantine_file)))
+        self.assertEqual((entry['repo'], entry['path'], entry['language'], entry['reason']), (None, None, 'Python', 'error'))
+
+
+    def test_raw_stage_round_trip(self):
+        code = (
+            'def add(first, second):\n'
+            '    """Compute the sum of two numbers and return the result to the caller."""\n'
+            '    return first + second\n'
+        )
+        samples = [
+            {'code': code, 'repo_name': 'owner/repo', 'path': 'sample.py', 'language': 'Python', 'license': 'mit', 'size': len(code)},
+            # Raw stage records without docstring
+            {'code': 'def foo():\n    return 1\n', 'repo_name': 'owner/repo', 'path': 'foo.py', 'language': 'Python', 'license': 'mit', 'size': 24},
+        ]
+        data_format = DataFormat.from_yaml('data/format/codeparot-format.yaml')
+        for output_format in ['jsonl', 'parquet']:
+            save_path = os.path.join(self.tmp_dir.name, output_format)
+            get_opt = lambda *args: get_arg_parser().parse_args([save_path, '--save_path', save_path, '--output_format', output_format, *args])
+
+            # Same filtered records from source files and from their saved raw stage
+            counts, outputs, _ = _processing(iter(samples), data_format, 0, get_opt('--raw_only'))
+            self.assertGreater(counts[0], 0)
+            raw_file, = [path for path in outputs if '/raw/' in path]
+            counts, _, _ = _processing(iter(samples), data_format, 1, get_opt('--filtered_only'))
+            n_filtered = counts[3]
+            self.assertGreater(n_filtered, 0)
+
+            opt = get_opt('--cons_from_raw', '--filtered_only')
+            counts, outputs, metrics = _processing(load_shard(get_stage_shard(raw_file), opt), None, 2, opt)
+            self.assertNotIn('quarantine/error', metrics['counters'])
+            self.assertEqual(counts[3], n_filtered)
+
+
+    def test_stage_input_not_parsed(self):
+        # Filtered record of a language whose grammar is not built (nor buildable here)
+        record = {
+            'identifier': 'add', 'parameters': {}, 'code': 'fn add(a: i32) -> i32 { a + 1 }',
+            'code_tokens': ['fn', 'add'], 'original_docstring': '/// Add one to the given number and return it.',
+            'docstring': 'Add one to the given number and return it.', 'docstring_tokens': ['Add', 'one'],
+            'comment': [], 'repo': 'owner/repo', 'path': 'lib.rs', 'language': 'Rust',
+        }
+        for language in ['Rust', 'all']:
+            opt = self.get_opt('--cons_from_filtered', '--language', language)
+            _, _, metrics = _processing(iter([record]), None, 0, opt)
+            self.assertEqual(metrics['counters']['samples'], 1)
+            self.assertNotIn('unavailable_language', metrics['counters'])
+            self.assertNotIn('rust', processing._WORKER_PARSERS)
+
+
+    def test_load_from_directory(self):
+        data_path = os.path.join(self.tmp_dir.name, 'data')
+        save_path = os.path.join(self.tmp_dir.name, 'output')
+        os.makedirs(os.path.join(data_path, 'part'))
+        os.makedirs(save_path)
+        code = (
+            'def add(first, second):\n'
+            '    """Compute the sum of two numbers and return the result to the caller."""\n'
+            '    return first + second\n'
+        )
+        # One task per compressed file, the uncompressed one is split
+        filenames = ['a.jsonl.gz', 'part/b.jsonl.gz', 'c.jsonl', 'notes.txt']
+        for idx, filename in enumerate(filenames):
+            with open_file(os.path.join(data_path, filename), 'wb') as file:
+                for position in range(4):
+                    sample = {'code': code.replace('add', f'add_{idx}_{position}'), 'repo_name': f'owner/repo_{idx}',
+                              'path': f'file_{position}.py', 'language': 'Python', 'license': 'mit', 'size': len(code)}
+                    file.write((json.dumps(sample) + '\n').encode('utf8'))
+        self.assertEqual(list_jsonl_files(data_path), [os.path.join(data_path, name) for name in ['a.jsonl.gz', 'c.jsonl', 'part/b.jsonl.gz']])
+
+        opt = get_arg_parser().parse_args([data_path, '--load_from_file', '--save_path', save_path, '--n_split', '6', '--n_core', '2'])
+        self.assertEqual(main(opt), 0)
+
+        with open(os.path.join(save_path, 'manifest.jsonl')) as file:
+            entries = [json.loads(line) for line in file]
+        n_tasks = [sum(entry['shard']['path'].endswith(name) for entry in entries) for name in filenames[:3]]
+        self.assertEqual(n_tasks[:2], [1, 1])
+        self.assertGreater(n_tasks[2], 1)
+        self.assertEqual(sum(entry['counts'][3] for entry in entries), 12)
+        with open(os.path.join(save_path, 'metrics.json')) as file:
+            self.assertEqual(json.load(file)['counters']['samples'], 12)
+
+
+    def test_split_hf_dataset(self):
+        from datasets import Dataset
+
+        sizes = [5, 1, 1, 30, 2, 2, 8, 1, 40, 3, 6, 1]
+        datasets = [
+            Dataset.from_dict({'code': ['x' * size for size in sizes], 'size': sizes}),
+            Dataset.from_dict({'code': ['x' * size for size in sizes]}),  # equal rows
+        ]
+        for dataset in datasets:
+            for n_split in [1, 3, 5, 12, 50]:
+                opt = Namespace(data_path='cache', n_split=n_split, task_size=0)
+                shards, weights = split_hf_dataset(dataset, opt)
+
+                # Contiguous ranges covering every row once
+                rows = [shard['rows'] for shard in shards]
+                self.assertEqual(rows[0][0], 0)
+                self.assertEqual(rows[-1][1], len(sizes))
+                for (_, end), (start, _) in zip(rows[:-1], rows[1:]):
+                    self.assertEqual(end, start)
+                self.assertTrue(all(start < end for start, end in rows))
+                self.assertLessEqual(len(shards), n_split)
+
+                expected = sizes if 'size' in dataset.column_names else [1] * len(sizes)
+                self.assertEqual(weights, [sum(expected[start:end]) for start, end in rows])
+
+        # --task_size in MB of code, rows are never cut (large rows merge tasks)
+        shards, weights = split_hf_dataset(datasets[0], Namespace(data_path='cache', n_split=1, task_size=20 / 2**20))
+        self.assertEqual(len(shards), 4)
+        self.assertEqual(sum(weights), sum(sizes))
+
+
+    def test_repo_shard(self):
+        repos = [f'owner_{idx}/repo_{idx}' for idx in range(1000)]
+        shards = [get_repo_shard(repo, 4) for repo in repos]
+        # Stable across processes and runs (crc32, not `hash`), every node gets repos
+        self.assertEqual(get_repo_shard('owner_0/repo_0', 4), 3)
+        self.assertEqual(shards, [get_repo_shard(repo, 4) for repo in repos])
+        self.assertEqual(set(shards), {0, 1, 2, 3})
+        self.assertTrue(all(150 < shards.count(shard) < 350 for shard in range(4)))
+
+    def test_node_tasks(self):
+        # Range: each task on exactly one node
+        tasks = [get_node_tasks(range(10), 10, Namespace(num_shards=3, shard_id=shard_id, shard_by='range')) for shard_id in range(3)]
+        self.assertEqual(sorted(idx for node in tasks for idx in node), list(range(10)))
+        self.assertEqual(tasks[1], [1, 4, 7])
+
+        # Repo: every node reads every task (records are filtered by `get_repo_shard`)
+        self.assertEqual(get_node_tasks(range(10), 10, Namespace(num_shards=3, shard_id=1, shard_by='repo')), list(range(10)))
+        self.assertEqual(get_node_tasks([2, 0, 1], 3, Namespace(num_shards=1, shard_id=0, shard_by='range')), [2, 0, 1])
+
+        # Fewer tasks than nodes fall back to repo partitioning
+        opt = Namespace(num_shards=4, shard_id=3, shard_by='range')
+        self.assertEqual(get_node_tasks(range(2), 2, opt), [0, 1])
+        self.assertEqual(opt.shard_by, 'repo')
+
+
+    def test_stages(self):
+        cases = [
+            # (flags, input stage, stages to run, stages to save)
+            ([], None, ['raw', 'filtered', 'extracted'], ['filtered', 'extracted']),
+            (['--raw_only'], None, ['raw'], ['raw']),
+            (['--filtered_only'], None, ['raw', 'filtered'], ['filtered']),
+            (['--extracted_only'], None, ['raw', 'filtered', 'extracted'], ['extracted']),
+            (['--cons_from_raw'], 'raw', ['filtered', 'extracted'], ['filtered', 'extracted']),
+            (['--cons_from_raw', '--filtered_only'], 'raw', ['filtered'], ['filtered']),
+            (['--cons_from_raw', '--extracted_only'], 'raw', ['filtered', 'extracted'], ['extracted']),
+            (['--cons_from_filtered'], 'filtered', ['extracted'], ['extracted']),
+            (['--cons_from_filtered', '--extracted_only'], 'filtered', ['extracted'], ['extracted']),
+            # Nothing to run (rejected by the command line)
+            (['--cons_from_filtered', '--raw_only'], 'filtered', [], ['raw']),
+        ]
+        for flags, input_stage, run_stages, save_stages in cases:
+            self.assertEqual(get_stages(self.get_opt(*flags)), (input_stage, run_stages, save_stages), flags)
+
+
+    def test_worker_parsers(self):
+        data_path = os.path.join(self.tmp_dir.name, 'data.jsonl')
+        code = (
+            'def add(first, second):\n'
+            '    """Compute the sum of two numbers and return the result to the caller."""\n'
+            '    return first + second\n'
+        )
+        with open(data_path, 'w') as file:
+            for idx in range(8):
+                sample = {'code': code.replace('add', f'add_{idx}'), 'repo_name': 'owner/repo', 'path': f'file_{idx}.py',
+                          'language': 'Python', 'license': 'mit', 'size': len(code)}
+                file.write(json.dumps(sample) + '\n')
+        shard = get_stage_shard(data_path)
+        opt = self.get_opt('--load_from_file')
+        # Data format is compiled once in the main process and sent with every task
+        data_format = DataFormat.from_yaml(opt.data_format)
+
+        tasks = [[shard, data_format, opt, idx] for idx in range(6)]
+        with ProcessPoolExecutor(2, initializer=init_worker, initargs=(['python'],)) as executor:
+            results = list(executor.map(_run_task, tasks))
+
+        self.assertEqual([result[3] for result in results], list(range(6)))
+        self.assertTrue(all(result[4][3] == 8 for result in results))
+        # Built by the initializer before any task, then reused by every task of the worker
+        parsers = {}
+        for pid, before, after, _, _ in results:
+            self.assertEqual(before, after)
+            parsers.setdefault(pid, set()).add(after)
+        self.assertLessEqual(len(parsers), 2)
+        self.assertTrue(all(len(ids) == 1 for ids in parsers.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
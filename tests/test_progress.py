@@ -0,0 +1,60 @@
+'''test for aggregated progress'''
+import unittest
+import multiprocessing
+
+from src.codetext.utils.progress import ProgressReporter, SharedProgress
+
+
+def _work(counters):
+    progress = SharedProgress(counters, flush_interval=60)
+    for _ in range(100):
+        progress.add(samples=1, bytes=10, functions=2, weight=5)
+    progress.flush()
+
+
+class Test_Progress(unittest.TestCase):
+    def test_shared(self):
+        progress = SharedProgress()
+        processes = [multiprocessing.Process(target=_work, args=(progress.counters,)) for _ in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+
+        self.assertEqual(progress.read(), {'samples': 300, 'bytes': 3000, 'functions': 600, 'weight': 1500})
+
+    def test_reset(self):
+        progress = SharedProgress(n_tasks=3, flush_interval=60)
+        for task in range(3):
+            progress.set_task(task)
+            progress.add(samples=task + 1, weight=10)
+        progress.flush()
+        self.assertEqual(progress.read(), {'samples': 6, 'bytes': 0, 'functions': 0, 'weight': 30})
+
+        # Retried task counts from zero again
+        progress.reset([1])
+        self.assertEqual(progress.read(), {'samples': 4, 'bytes': 0, 'functions': 0, 'weight': 20})
+
+    def test_reporter(self):
+        now = [100.]
+        progress = SharedProgress(flush_interval=0)
+        with ProgressReporter(progress, total_weight=200, log_interval=0, refresh=0.01, clock=lambda: now[0]) as reporter:
+            snapshot = reporter.snapshot()
+            self.assertEqual(snapshot['progress'], 0.)
+            self.assertIsNone(snapshot['eta'])
+
+            progress.add(samples=4, bytes=2**20, functions=3, weight=50)
+            now[0] += 10
+            snapshot = reporter.snapshot()
+            self.assertEqual(snapshot['samples'], 4)
+            self.assertEqual(snapshot['progress'], 0.25)
+            self.assertEqual(snapshot['samples/s'], 0.4)
+            self.assertEqual(snapshot['MB/s'], 0.1)
+            # 10s for a quarter of the weight, 30s left
+            self.assertEqual(snapshot['eta'], 30.)
+
+        progress.add(weight=500)
+        self.assertEqual(reporter.snapshot()['progress'], 1.)
+
+if __name__ == '__main__':
+    unittest.main()
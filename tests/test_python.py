@@ -1,10 +1,12 @@
 '''test for python parser'''
 import os
+import sys
 import unittest
 from pathlib import Path
 
 from tree_sitter import Language, Parser
 from src.codetext.utils.parser import PythonParser
+from src.codetext.utils.parser.language_parser import SourceView, match_from_span, node_parent, parent_and_previous_sibling, previous_sibling, tokenize_code, traverse, traverse_type
 
 ROOT_PATH = str(Path(__file__).parents[1])
 
@@ -36,6 +38,69 @@ class Test_PythonParser(unittest.TestCase):
         
         self.assertEqual(len(class_list), 1)
     
+    def test_get_node_lists(self):
+        tree = self.parser.parse(bytes(self.code_sample, 'utf8'))
+        root = tree.root_node
+        
+        function_list, class_list = PythonParser.get_node_lists(root)
+        
+        self.assertEqual(function_list, PythonParser.get_function_list(root))
+        self.assertEqual(class_list, PythonParser.get_class_list(root))
+    
+    def test_node_index(self):
+        tree = self.parser.parse(bytes(self.code_sample, 'utf8'))
+        root = tree.root_node
+        index = PythonParser.build_index(root)
+        
+        function_list, class_list = PythonParser.get_node_lists(root, index)
+        self.assertEqual(function_list, PythonParser.get_function_list(root))
+        self.assertEqual(class_list, PythonParser.get_class_list(root))
+        
+        for node in function_list + class_list:
+            self.assertEqual(PythonParser.get_comment_node(node, index=index), PythonParser.get_comment_node(node))
+            self.assertEqual(tokenize_code(node, self.code_sample, index=index), tokenize_code(node, self.code_sample))
+            error_nodes = []
+            traverse_type(node, error_nodes, ['ERROR'], index=index)
+            self.assertEqual(error_nodes, [])
+    
+    def test_deep_nesting(self):
+        depth = sys.getrecursionlimit()
+        code_sample = 'def deep():\n    return ' + '[' * depth + '1' + ']' * depth + '\n'
+        tree = self.parser.parse(bytes(code_sample, 'utf8'))
+        root = tree.root_node
+        
+        self.assertEqual(len(PythonParser.get_function_list(root)), 1)
+        tokens = []
+        traverse(root, tokens)
+        self.assertEqual(len(tokens), 2 * depth + 7)
+    
+    def test_node_parent(self):
+        code_sample = '''
+class Sample:
+    @staticmethod
+    def test_sample():
+        return
+'''
+        tree = self.parser.parse(bytes(code_sample, 'utf8'))
+        function = PythonParser.get_function_list(tree.root_node)[0]
+        
+        parent = node_parent(tree, function)
+        self.assertEqual(parent.type, 'decorated_definition')
+        self.assertEqual(previous_sibling(tree, function).type, 'decorator')
+        self.assertEqual(parent_and_previous_sibling(tree, parent), (parent.parent, None))
+        with self.assertRaises(ValueError):
+            node_parent(tree, tree.root_node)
+    
+    def test_source_view(self):
+        tree = self.parser.parse(bytes(self.code_sample, 'utf8'))
+        root = tree.root_node
+        view = SourceView(self.code_sample)
+        
+        for node in PythonParser.get_function_list(root) + PythonParser.get_class_list(root):
+            self.assertEqual(match_from_span(node, view), match_from_span(node, self.code_sample))
+            self.assertEqual(tokenize_code(node, view), tokenize_code(node, self.code_sample))
+            self.assertEqual(PythonParser.get_docstring(node, view), PythonParser.get_docstring(node, self.code_sample))
+    
     def test_is_function_empty(self):
         code_sample = '''
         def test_sample():
@@ -107,6 +172,22 @@ class Test_PythonParser(unittest.TestCase):
         assert comment_list[2] == '# pointer for greater element'
         assert len(comment_list) == 16
 
+    def test_process_line_nodes(self):
+        from src.codetext.utils.utils import process_line_nodes
+        
+        tree = self.parser.parse(bytes(self.code_sample, 'utf8'))
+        function_list = PythonParser.get_function_list(tree.root_node)
+        metadata = {'repo': 'owner/repo', 'path': 'sample.py', 'language': 'Python'}
+        
+        records = list(process_line_nodes(function_list, self.code_sample, PythonParser, metadata))
+        self.assertTrue(records)
+        for record in records:
+            self.assertEqual({key: record[key] for key in metadata}, metadata)
+        
+        # A function failing to process is skipped, others are kept
+        broken = list(process_line_nodes([None, *function_list], self.code_sample, PythonParser, metadata))
+        self.assertEqual(broken, records)
+
     # def test_extract_docstring(self):
     #     # Test epydoc style ===================
     #     docstring = """
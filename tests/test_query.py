@@ -0,0 +1,56 @@
+'''test for tree-sitter query backend'''
+import unittest
+from pathlib import Path
+
+from tree_sitter import Language, Parser
+from src.codetext.utils.parser import JavaParser, PythonParser
+from src.codetext.utils.parser.language_parser import tokenize_code, traverse_type
+from src.codetext.utils.parser.query import get_query, is_node_type
+
+ROOT_PATH = str(Path(__file__).parents[1])
+
+
+class Test_Query(unittest.TestCase):
+    def setUp(self) -> None:
+        self.py_language = Language(ROOT_PATH + "/tree-sitter/python.so", "python")
+        self.java_language = Language(ROOT_PATH + "/tree-sitter/java.so", "java")
+        return super().setUp()
+
+    def parse(self, language, filepath):
+        parser = Parser()
+        parser.set_language(language)
+        with open(filepath, 'r') as file:
+            code_sample = file.read()
+        return parser.parse(bytes(code_sample, 'utf8')).root_node, code_sample
+
+    def test_get_query(self):
+        self.assertTrue(is_node_type(self.py_language, 'function_definition'))
+        self.assertFalse(is_node_type(self.py_language, 'method_declaration'))
+
+        query = get_query(self.py_language, ('function_definition', 'method_declaration'))
+        self.assertIs(query, get_query(self.py_language, ('function_definition', 'method_declaration')))
+        self.assertIsNone(get_query(self.py_language, ('method_declaration',)))
+
+    def test_same_as_traversal(self):
+        samples = [
+            (PythonParser, self.py_language, 'tests/test_sample/py_test_sample.py'),
+            (JavaParser, self.java_language, 'tests/test_sample/java_test_sample.java'),
+        ]
+        for language_parser, language, filepath in samples:
+            root, code_sample = self.parse(language, filepath)
+            index = language_parser.build_index(root, language)
+
+            function_list, class_list = language_parser.get_node_lists(root, index)
+            self.assertEqual(function_list, language_parser.get_function_list(root))
+            self.assertEqual(class_list, language_parser.get_class_list(root))
+
+            for node in function_list + class_list:
+                self.assertEqual(language_parser.get_comment_node(node, index=index), language_parser.get_comment_node(node))
+                self.assertEqual(tokenize_code(node, code_sample, index=index), tokenize_code(node, code_sample))
+                error_nodes = []
+                traverse_type(node, error_nodes, ['ERROR'], index=index)
+                self.assertEqual(error_nodes, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+'''test for streaming reader'''
+import os
+import json
+import tempfile
+import unittest
+
+from src.codetext.utils.reader import _PYARROW_AVAILABLE, iter_arrow, iter_jsonl, list_arrow_files, split_jsonl_by_offset
+
+
+class Test_Reader(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.filepath = os.path.join(self.tmp_dir.name, 'sample.jsonl')
+        
+        self.samples = [{'code': 'x' * (idx * 7 % 50), 'repo': f'repo_{idx}'} for idx in range(100)]
+        with open(self.filepath, 'w') as file:
+            for item in self.samples:
+                file.write(json.dumps(item) + '\n')
+        return super().setUp()
+    
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def test_split_jsonl_by_offset(self):
+        for n_split in [1, 3, 7, 100, 500]:
+            byte_ranges = split_jsonl_by_offset(self.filepath, n_split)
+            
+            self.assertEqual(byte_ranges[0][0], 0)
+            self.assertEqual(byte_ranges[-1][1], os.path.getsize(self.filepath))
+            for (_, end), (start, _) in zip(byte_ranges[:-1], byte_ranges[1:]):
+                self.assertEqual(end, start)
+
+    def test_iter_jsonl(self):
+        samples = []
+        for start, end in split_jsonl_by_offset(self.filepath, 7):
+            samples.extend(json.loads(line) for line in iter_jsonl(self.filepath, start, end))
+        
+        self.assertEqual(samples, self.samples)
+
+    @unittest.skipUnless(_PYARROW_AVAILABLE, "`pyarrow` is not available")
+    def test_iter_arrow(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        
+        table = pa.Table.from_pylist(self.samples)
+        pq.write_table(table, os.path.join(self.tmp_dir.name, 'sample.parquet'), row_group_size=30)
+        with pa.OSFile(os.path.join(self.tmp_dir.name, 'sample.arrow'), 'wb') as sink:
+            with pa.ipc.new_stream(sink, table.schema) as writer:
+                writer.write_table(table, max_chunksize=30)
+        
+        filelist = list_arrow_files(self.tmp_dir.name)
+        self.assertEqual([os.path.basename(file) for file in filelist], ['sample.arrow', 'sample.parquet'])
+        for filepath in filelist:
+            self.assertEqual(list(iter_arrow(filepath, batch_size=16)), self.samples)
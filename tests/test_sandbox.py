@@ -0,0 +1,119 @@
+'''test for sample time budget and in-flight journal'''
+import os
+import time
+import tempfile
+import unittest
+import multiprocessing
+
+from tree_sitter import Language, Parser
+from src.codetext.utils.parser import PythonParser
+from src.codetext.utils.sandbox import InflightJournal, SampleTimeout, time_budget
+from src.codetext.utils.utils import ROOT_PATH, process_raw_tree
+
+
+class _SlowParser(PythonParser):
+    @staticmethod
+    def get_function_metadata(function_node, blob=None):
+        while True:
+            pass
+
+
+def _task(filepath, crashing, queue):
+    journal = InflightJournal(filepath)
+    crashed_positions = journal.load()
+    for position in range(8):
+        if position in crashed_positions:
+            continue
+        journal.start(position)
+        if position in crashing:
+            os._exit(1)  # hard crash, nothing is cleaned up
+        queue.put(position)
+    journal.close()
+
+
+class Test_Sandbox(unittest.TestCase):
+    def test_time_budget(self):
+        with self.assertRaises(SampleTimeout):
+            with time_budget(0.05):
+                while True:
+                    pass
+
+        with time_budget(0.05):
+            pass
+        time.sleep(0.1)  # timer is cancelled when leaving the block
+
+        with time_budget(0):
+            time.sleep(0.01)
+
+    def test_time_budget_extraction(self):
+        parser = Parser()
+        parser.set_language(Language(os.path.join(ROOT_PATH, 'tree-sitter', 'python.so'), 'python'))
+        code = 'def foo(a):\n    # add one\n    return a + 1\n'
+        tree = parser.parse(bytes(code, 'utf8'))
+
+        # Extraction helpers skip nodes raising an error, not a timeout
+        for levels in [['function'], ['inline']]:
+            with self.assertRaises(SampleTimeout):
+                with time_budget(0.05):
+                    process_raw_tree(tree, code, _SlowParser, {}, levels)
+
+    def test_journal(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, 'batch_0.inflight')
+
+            journal = InflightJournal(filepath)
+            self.assertEqual(journal.load(), set())
+            journal.start(3)
+            journal.start(12)
+
+            # Crashed before `close`, crashes of every attempt are kept
+            self.assertEqual(InflightJournal(filepath).load(), {12})
+            journal = InflightJournal(filepath)
+            journal.start(15)
+            self.assertEqual(InflightJournal(filepath).load(), {12, 15})
+
+            # Cleanly interrupted attempt keeps crashed positions
+            journal = InflightJournal(filepath)
+            journal.start(16)
+            journal.close(done=False)
+            self.assertEqual(InflightJournal(filepath).load(), {12, 15})
+
+            journal.close()
+            self.assertFalse(os.path.exists(filepath))
+            self.assertEqual(InflightJournal(filepath).load(), set())
+
+            # Crash after the records of a sample are written blames no sample
+            journal = InflightJournal(filepath)
+            journal.start(20)
+            journal.finish()
+            self.assertEqual(InflightJournal(filepath).load(), set())
+
+            journal = InflightJournal(filepath)
+            journal.start(21)
+            InflightJournal(filepath).load()
+            InflightJournal.remove(filepath)
+            self.assertEqual(InflightJournal(filepath).load(), set())
+
+    def test_two_crashes(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            filepath = os.path.join(tmp_dir, 'batch_0.inflight')
+            queue = multiprocessing.Queue()
+
+            exitcodes = []
+            for _ in range(4):
+                process = multiprocessing.Process(target=_task, args=(filepath, {2, 5}, queue))
+                process.start()
+                process.join()
+                exitcodes.append(process.exitcode)
+                if process.exitcode == 0:
+                    break
+            self.assertEqual(exitcodes, [1, 1, 0])
+
+            done = set()
+            while len(done) < 6:
+                done.add(queue.get(timeout=10))
+            self.assertEqual(done, {0, 1, 3, 4, 6, 7})
+            self.assertFalse(os.path.exists(filepath))
+
+if __name__ == '__main__':
+    unittest.main()
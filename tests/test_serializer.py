@@ -0,0 +1,50 @@
+'''test for json serializer'''
+import json
+import math
+import unittest
+
+from src.codetext.utils.serializer import _ORJSON_AVAILABLE, JsonSerializer
+
+
+class Test_Serializer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.samples = [
+            {'identifier': 'func', 'code_tokens': ['def', 'func'], 'docstring': 'Trả về tổng', 'size': 10, 'score': 0.5},
+            {'identifier': 'func_1', 'docstring_params': {'params': [{'docstring': None}]}},
+        ]
+        return super().setUp()
+
+    def test_compatible(self):
+        serializer = JsonSerializer('json')
+        expected = ''.join(json.dumps(item, ensure_ascii=False) + '\n' for item in self.samples)
+
+        self.assertEqual(serializer.dumps_lines(self.samples), expected.encode('utf8'))
+        self.assertEqual(serializer.dumps_lines([]), b'')
+        self.assertEqual(JsonSerializer('json', ensure_ascii=True).dumps(self.samples[0]), json.dumps(self.samples[0]).encode('utf8'))
+
+    @unittest.skipUnless(_ORJSON_AVAILABLE, "`orjson` is not available")
+    def test_orjson(self):
+        serializer = JsonSerializer('auto')
+        self.assertEqual(serializer.backend, 'orjson')
+
+        lines = serializer.dumps_lines(self.samples).splitlines()
+        self.assertEqual([serializer.loads(line) for line in lines], self.samples)
+
+        # Fallback to stdlib
+        self.assertEqual(serializer.dumps({1: 'a'}), b'{"1": "a"}')
+        self.assertTrue(math.isnan(serializer.loads('{"a": NaN}')['a']))
+        self.assertEqual(serializer.dumps({'a': None, 'b': [float('nan'), float('-inf')]}), b'{"a": null, "b": [NaN, -Infinity]}')
+        self.assertEqual(serializer.dumps({'a': None, 'b': 0.5}), b'{"a":null,"b":0.5}')
+
+        # orjson can not escape non-ascii
+        serializer = JsonSerializer('orjson', ensure_ascii=True)
+        self.assertEqual(serializer.backend, 'json')
+        self.assertEqual(serializer.dumps(self.samples[0]), json.dumps(self.samples[0]).encode('utf8'))
+
+    def test_backend(self):
+        with self.assertRaises(ValueError):
+            JsonSerializer('ujson')
+
+
+if __name__ == '__main__':
+    unittest.main()
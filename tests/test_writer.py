@@ -0,0 +1,89 @@
+'''test for buffered writer'''
+import os
+import json
+import tempfile
+import unittest
+
+from src.codetext.utils.reader import iter_arrow
+from src.codetext.utils.serializer import JsonSerializer
+from src.codetext.utils.writer import _PYARROW_AVAILABLE, JsonlWriter, ParquetWriter, file_checksum, open_writer
+
+
+class Test_Writer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.save_path = os.path.join(self.tmp_dir.name, 'batch_0_function_data.jsonl')
+        self.samples = [{'identifier': f'func_{idx}', 'docstring': 'Trả về tổng'} for idx in range(25)]
+        return super().setUp()
+    
+    def tearDown(self) -> None:
+        self.tmp_dir.cleanup()
+        return super().tearDown()
+
+    def test_write(self):
+        with JsonlWriter(self.save_path, buffer_size=10, serializer=JsonSerializer('json')) as writer:
+            writer.extend(self.samples[:12])
+            self.assertFalse(os.path.exists(self.save_path))
+            writer.extend(self.samples[12:])
+        
+        with open(self.save_path, 'r') as file:
+            lines = list(file)
+        self.assertEqual(writer.count, 25)
+        self.assertEqual([json.loads(line) for line in lines], self.samples)
+        self.assertEqual(lines[0], json.dumps(self.samples[0], ensure_ascii=False) + '\n')
+        self.assertFalse(os.path.exists(writer.tmp_path))
+        
+    def test_abort(self):
+        with self.assertRaises(RuntimeError):
+            with JsonlWriter(self.save_path, buffer_size=10) as writer:
+                writer.extend(self.samples)
+                raise RuntimeError()
+        
+        self.assertFalse(os.path.exists(self.save_path))
+        self.assertFalse(os.path.exists(writer.tmp_path))
+
+    @unittest.skipUnless(_PYARROW_AVAILABLE, "`pyarrow` is not available")
+    def test_parquet(self):
+        import pyarrow.parquet as pq
+        
+        save_path = os.path.join(self.tmp_dir.name, 'batch_0_function_data.parquet')
+        samples = [{'identifier': 'func', 'parameters': [], 'docstring_params': None}] + \
+            [{'identifier': f'func_{idx}', 'parameters': ['a', 'b'], 'docstring_params': {'params': [{'docstring': None}]}} for idx in range(24)]
+        
+        with open_writer(save_path, buffer_size=10, compression='zst') as writer:
+            self.assertIsInstance(writer, ParquetWriter)
+            writer.extend(samples)
+            self.assertFalse(os.path.exists(save_path))
+        
+        self.assertEqual(writer.count, 25)
+        self.assertEqual(writer.checksum, file_checksum(save_path))
+        self.assertEqual(pq.read_metadata(save_path).num_row_groups, 3)
+        self.assertEqual(pq.read_table(save_path, columns=['identifier']).column('identifier').to_pylist()[1], 'func_0')
+        self.assertEqual(list(iter_arrow(save_path)), samples)
+
+    @unittest.skipUnless(_PYARROW_AVAILABLE, "`pyarrow` is not available")
+    def test_parquet_schema_change(self):
+        import pyarrow.parquet as pq
+        
+        save_path = os.path.join(self.tmp_dir.name, 'batch_0_inline_data.parquet')
+        samples = [
+            {'code': 'a = 1', 'prev_context': None, 'next_context': None, 'tags': []},
+            {'code': 'b = 2', 'prev_context': {'code': 'a = 1', 'start_point': [0, 0]}, 'next_context': None, 'tags': []},
+            {'code': 'c = 3', 'prev_context': None, 'next_context': None, 'tags': ['x'], 'extra': {'k': 1}},
+            {'code': 'd = 4', 'prev_context': None, 'next_context': {'code': 'c = 3'}, 'tags': [], 'lang': 'python'},
+        ]
+        
+        with ParquetWriter(save_path, buffer_size=1) as writer:
+            writer.extend(samples)
+        
+        self.assertEqual(pq.read_metadata(save_path).num_row_groups, 4)
+        self.assertEqual(writer.checksum, file_checksum(save_path))
+        self.assertFalse([name for name in os.listdir(self.tmp_dir.name) if '.tmp' in name])
+        expected = [{'extra': None, 'lang': None, **sample} for sample in samples]
+        self.assertEqual(list(iter_arrow(save_path)), expected)
+
+        # A column holding strings can not turn into a json column afterwards
+        with self.assertRaises(ValueError):
+            with ParquetWriter(save_path, buffer_size=1) as writer:
+                writer.extend([{'code': 'a'}, {'code': {'a': 1}}])
+        self.assertFalse([name for name in os.listdir(self.tmp_dir.name) if '.tmp' in name])